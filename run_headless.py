@@ -0,0 +1,56 @@
+#!/usr/bin/env python3
+"""
+Запуск алгоритма без графического интерфейса
+
+Использует только ядро (src/core) и не импортирует flet, поэтому
+может выполняться под PyPy: pypy3 run_headless.py rules.json "текст"
+"""
+
+import argparse
+import sys
+
+from src.core.markov_engine import MarkovEngine
+from src.core.exceptions import MarkovError
+
+def main():
+    """Основная точка вхождения"""
+    parser = argparse.ArgumentParser(description="Выполнение алгоритма Маркова без интерфейса")
+    parser.add_argument('rules', help="json файл с правилами (сохраненный или экспортированный)")
+    parser.add_argument('text', nargs='?', help="Входной текст, по умолчанию читается из stdin")
+    parser.add_argument('--input-file', help="Файл с входным текстом")
+    parser.add_argument('--max-iterations', type=int, default=1000, help="Максимум итераций")
+    parser.add_argument('--max-output-length', type=int, default=10000, help="Максимальная длина результата")
+    parser.add_argument('--stats', action='store_true', help="Вывести статистику выполнения")
+    args = parser.parse_args()
+    
+    if args.input_file:
+        with open(args.input_file, 'r', encoding='utf-8') as f:
+            input_text = f.read()
+    elif args.text is not None:
+        input_text = args.text
+    else:
+        input_text = sys.stdin.read()
+    
+    engine = MarkovEngine(max_iterations=args.max_iterations,
+                          max_output_length=args.max_output_length)
+    
+    try:
+        engine.load_rules(args.rules)
+        result = engine.execute(input_text)
+    except (OSError, ValueError, KeyError) as e:
+        print(f"Ошибка загрузки правил: {e}", file=sys.stderr)
+        return 1
+    except MarkovError as e:
+        print(f"Ошибка выполнения: {e}", file=sys.stderr)
+        return 1
+    
+    print(result['output'])
+    
+    if args.stats:
+        print(f"Статус: {result['status']}, итераций: {result['iterations']}, "
+              f"замен: {result['statistics']['total_replacements']}", file=sys.stderr)
+    
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -11,7 +11,8 @@ from .exceptions import (
     MarkovError, 
     RuleValidationError, 
     CycleDetectionError, 
-    ExecutionLimitError
+    ExecutionLimitError,
+    ExecutionCancelledError
 )
 
 __all__ = [
@@ -22,5 +23,6 @@ __all__ = [
     'MarkovError',
     'RuleValidationError', 
     'CycleDetectionError',
-    'ExecutionLimitError'
+    'ExecutionLimitError',
+    'ExecutionCancelledError'
 ]
\ No newline at end of file
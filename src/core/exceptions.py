@@ -16,4 +16,8 @@ class CycleDetectionError(MarkovError):
 
 class ExecutionLimitError(MarkovError):
     """Превышение лимита времени выполнения"""
+    pass
+
+class ExecutionCancelledError(MarkovError):
+    """Отмена выполнения"""
     pass
\ No newline at end of file
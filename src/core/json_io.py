@@ -0,0 +1,42 @@
+"""
+Сериализация JSON
+
+Использует orjson, если он установлен, иначе стандартный модуль json.
+Оба варианта работают с байтами в UTF-8.
+"""
+
+from typing import Any, Callable, Optional
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+    import json
+
+
+def dumps(obj: Any, indent: bool = True,
+          default: Optional[Callable[[Any], Any]] = None) -> bytes:
+    """
+    Сериализовать объект в JSON
+
+    Args:
+        obj: Сериализуемый объект
+        indent: Форматировать с отступом в 2 пробела
+        default: Преобразование объектов, которые не сериализуются напрямую
+
+    Returns:
+        JSON в кодировке UTF-8
+    """
+    if orjson is not None:
+        return orjson.dumps(obj, default=default, option=orjson.OPT_INDENT_2 if indent else 0)
+    if indent:
+        return json.dumps(obj, indent=2, ensure_ascii=False, default=default).encode('utf-8')
+    return json.dumps(obj, ensure_ascii=False, separators=(',', ':'),
+                      default=default).encode('utf-8')
+
+
+def loads(data: bytes) -> Any:
+    """Разобрать JSON из байтов или строки"""
+    if orjson is not None:
+        return orjson.loads(data)
+    return json.loads(data)
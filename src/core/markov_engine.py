@@ -2,18 +2,499 @@
 Основное ядро алгоритмов Маркова
 """
 
-from typing import List, Tuple, Dict, Any
+import copy
+import functools
+import os
+import sys
+import threading
+from array import array
+from itertools import accumulate, count, repeat
+from concurrent.futures import ProcessPoolExecutor
+from collections import OrderedDict
+from collections.abc import Sequence
+from typing import List, Tuple, Dict, Any, Optional, Iterator, NamedTuple, Callable
 from .rule_validator import RuleValidator
-from .exceptions import CycleDetectionError, ExecutionLimitError, RuleValidationError
+from . import json_io
+from .exceptions import (
+    CycleDetectionError, ExecutionLimitError, RuleValidationError, ExecutionCancelledError
+)
+
+# Рабочая строка хранится в UTF-32, чтобы позиция символа вычислялась из смещения в байтах
+_ENCODING = 'utf-32-le'
+_CHAR_SIZE = 4
+
+# Как часто ядро выполнения проверяет запрос отмены, в итерациях
+_CANCEL_CHECK_INTERVAL = 1024
+
+# Средняя длина текста, начиная с которой execute_batch распределяет тексты по процессам
+_PARALLEL_MIN_LENGTH = 1024
+
+# Генерация функций обновления вхождений окупается только на долгих выполнениях:
+# компиляция стоит около 2 мс для 4 правил, 8 мс для 8 и 30-40 мс для 16, а экономия
+# составляет 1-4 мкс на итерацию, то есть окупается через ~2, ~6 и ~10-12 тысяч
+# итераций соответственно. Для 24-32 правил порог превышает 20 тысяч итераций.
+# Поэтому функции генерируются только для наборов до _CODEGEN_MAX_RULES правил
+# и только когда выполнение общим циклом уже заняло _CODEGEN_MIN_ITERATIONS итераций
+_CODEGEN_MAX_RULES = 16
+_CODEGEN_MIN_ITERATIONS = 16 * _CANCEL_CHECK_INTERVAL
+
+# Сгенерированные функции для последних наборов правил, от старых к новым
+_UPDATER_CACHE_SIZE = 32
+_updater_cache: 'OrderedDict[Tuple[Any, ...], List[Callable[..., None]]]' = OrderedDict()
+
+def _find(buffer: bytearray, pattern: bytes, start: int = 0, end: Optional[int] = None) -> int:
+    """
+    Поиск закодированного значения в буфере UTF-32
+    
+    Args:
+        buffer: Рабочий буфер
+        pattern: Закодированное значение для поиска
+        start: Позиция символа, с которой начинается поиск
+        end: Позиция символа, до которой должно уместиться вхождение
+        
+    Returns:
+        Позиция символа или -1 если вхождения нет
+    """
+    limit = len(buffer) if end is None else end * _CHAR_SIZE
+    offset = buffer.find(pattern, start * _CHAR_SIZE, limit)
+    
+    # Вхождение должно начинаться на границе символа
+    while offset > 0 and offset % _CHAR_SIZE:
+        offset = buffer.find(pattern, offset - offset % _CHAR_SIZE + _CHAR_SIZE, limit)
+    
+    return offset if offset == -1 else offset // _CHAR_SIZE
+
+class _RuleTable(NamedTuple):
+    """Таблица правил в виде параллельных списков (pattern и replacement в UTF-32)"""
+    patterns: List[bytes]
+    replacements: List[bytes]
+    pattern_lengths: List[int]
+    replacement_lengths: List[int]
+    is_final: List[bool]
+    rule_indices: List[int]
+    # Для каждого правила: флаги правил, новое вхождение которых может создать его замена
+    creates: List[bytearray]
+
+def _update_positions(positions: List[int], present: bytearray, buffer: bytearray,
+                      patterns: List[bytes], pattern_lengths: List[int], creates: bytearray,
+                      position: int, removed: int, inserted: int) -> None:
+    """
+    Обновить самые левые вхождения правил после замены
+    
+    Новое вхождение может появиться только пересекая измененный участок,
+    поэтому повторный поиск ограничивается окном вокруг него. Полный поиск
+    до конца строки нужен только правилам, чье вхождение было затронуто заменой.
+    Правилам, которым эта замена не может создать вхождение, поиск не нужен.
+    
+    Args:
+        positions: Самые левые вхождения каждого правила (-1 если нет)
+        present: Флаги наличия вхождения для каждого правила
+        buffer: Рабочий буфер после замены
+        patterns: Закодированные значения правил
+        pattern_lengths: Длины значений в символах
+        creates: Флаги правил, вхождение которых может создать примененная замена
+        position: Позиция замены
+        removed: Длина замененного значения
+        inserted: Длина вставленного значения
+    """
+    delta = inserted - removed
+    edit_end = position + removed
+    window_end = position + inserted - 1
+    
+    for index, length in enumerate(pattern_lengths):
+        if not length:
+            # Пустое значение всегда находится в позиции 0
+            continue
+        
+        found = positions[index]
+        if found != -1 and found + length <= position:
+            # Вхождение до измененного участка не затронуто
+            continue
+        
+        if (found == -1 or found >= edit_end) and not creates[index]:
+            # Вхождения левее найденного не появилось, оно только сдвинулось
+            if found != -1:
+                positions[index] = found + delta
+            continue
+        
+        window_start = max(0, position - length + 1)
+        if found == -1 or found >= edit_end:
+            hit = _find(buffer, patterns[index], window_start, window_end + length)
+            if hit == -1 and found != -1:
+                hit = found + delta
+        else:
+            hit = _find(buffer, patterns[index], window_start)
+        
+        positions[index] = hit
+        present[index] = hit != -1
+
+# Функция обновления вхождений после применения одного правила
+_Updater = Callable[[List[int], bytearray, bytearray, int], None]
+
+def _search_source(pattern: bytes, length: int, indent: str,
+                   end: Optional[str] = None) -> List[str]:
+    """
+    Исходный код поиска значения в буфере, как _find, с результатом в hit
+    
+    Поиск начинается с окна перед позицией замены, смещения в байтах
+    и проверка границы символа записываются прямо в код без вызова _find.
+    """
+    if length > 1:
+        start = f"(position - {length - 1}) << 2 if position > {length - 1} else 0"
+    else:
+        start = "position << 2"
+    limit = f", {end}" if end is not None else ""
+    return [
+        f"{indent}hit = buffer.find({pattern!r}, {start}{limit})",
+        f"{indent}while hit > 0 and hit & 3:",
+        f"{indent}    hit = buffer.find({pattern!r}, (hit | 3) + 1{limit})",
+        f"{indent}hit >>= 2",
+    ]
+
+def _updater_source(name: str, slot: int, table: _RuleTable) -> List[str]:
+    """
+    Исходный код обновления вхождений после применения правила slot
+    
+    Повторяет _update_positions для конкретного правила: цикл по правилам
+    развернут, значения, длины и флаги создания вхождений подставлены
+    константами, а ветки, которые для этой пары правил не выполняются,
+    не генерируются.
+    """
+    removed = table.pattern_lengths[slot]
+    inserted = table.replacement_lengths[slot]
+    delta = inserted - removed
+    creates = table.creates[slot]
+    
+    lines = [f"def {name}(positions, present, buffer, position):"]
+    for index, (pattern, length) in enumerate(zip(table.patterns, table.pattern_lengths)):
+        if not length:
+            continue
+        lines.append(f"    found = positions[{index}]")
+        if creates[index]:
+            window_end = f"(position + {inserted - 1 + length}) << 2"
+            lines.append(f"    if found == -1 or found > position - {length}:")
+            lines.append(f"        if found == -1 or found >= position + {removed}:")
+            lines += _search_source(pattern, length, " " * 12, window_end)
+            lines += [
+                "            if hit == -1 and found != -1:",
+                f"                hit = found + {delta}",
+                "        else:",
+            ]
+            lines += _search_source(pattern, length, " " * 12)
+            lines += [
+                f"        positions[{index}] = hit",
+                f"        present[{index}] = hit != -1",
+            ]
+        elif delta:
+            lines += [
+                f"    if found != -1 and found > position - {length}:",
+                f"        if found >= position + {removed}:",
+                f"            positions[{index}] = found + {delta}",
+                "        else:",
+            ]
+            lines += _search_source(pattern, length, " " * 12)
+            lines += [
+                f"            positions[{index}] = hit",
+                f"            present[{index}] = hit != -1",
+            ]
+        else:
+            lines.append(f"    if found != -1 and position - {length} < found < position + {removed}:")
+            lines += _search_source(pattern, length, " " * 8)
+            lines += [
+                f"        positions[{index}] = hit",
+                f"        present[{index}] = hit != -1",
+            ]
+    lines.append("    return None")
+    return lines
+
+def _compile_updaters(table: _RuleTable) -> Optional[List[_Updater]]:
+    """
+    Сгенерировать и скомпилировать функции обновления вхождений для таблицы правил
+    
+    Для каждого правила создается своя функция, заменяющая _update_positions.
+    Объем кода растет квадратично от количества правил, поэтому для больших
+    наборов генерация не выполняется. Скомпилированные функции кэшируются
+    по содержимому таблицы.
+    
+    Returns:
+        Функции по индексам правил таблицы или None для больших наборов
+    """
+    if len(table.patterns) > _CODEGEN_MAX_RULES:
+        return None
+    
+    key = (tuple(table.patterns), tuple(table.replacement_lengths),
+           tuple(bytes(row) for row in table.creates))
+    updaters = _updater_cache.get(key)
+    if updaters is not None:
+        _updater_cache.move_to_end(key)
+        return updaters
+    
+    source = []
+    for slot in range(len(table.patterns)):
+        source += _updater_source(f"_update_{slot}", slot, table)
+    namespace: Dict[str, Any] = {}
+    exec(compile("\n".join(source), "<markov rules>", "exec"), namespace)
+    
+    updaters = [namespace[f"_update_{slot}"] for slot in range(len(table.patterns))]
+    _updater_cache[key] = updaters
+    if len(_updater_cache) > _UPDATER_CACHE_SIZE:
+        _updater_cache.popitem(last=False)
+    return updaters
+
+def _run_rules(buffer: bytearray, table: _RuleTable, max_iterations: int, max_length: int,
+               cancel_event: Optional[threading.Event] = None,
+               updaters: Optional[List[_Updater]] = None,
+               compile_updaters: Optional[Callable[[], Optional[List[_Updater]]]] = None
+               ) -> Tuple[str, array, array]:
+    """
+    Ядро выполнения: применяет правила к буферу на месте
+    
+    Работает только с буфером и таблицей правил, без обращений к объектам
+    правил, истории и статистике - учет выполняется после завершения.
+    
+    Args:
+        buffer: Рабочий буфер, изменяется на месте
+        table: Таблица правил
+        max_iterations: Максимум итераций
+        max_length: Максимальная длина результата в символах
+        cancel_event: Событие отмены, проверяется каждые _CANCEL_CHECK_INTERVAL итераций
+        updaters: Сгенерированные функции обновления вхождений, None - _update_positions
+        compile_updaters: Генерация функций обновления, вызывается один раз, если
+            выполнение общим циклом заняло _CODEGEN_MIN_ITERATIONS итераций
+        
+    Returns:
+        Кортеж (статус, индексы примененных правил, позиции применений)
+    """
+    (patterns, replacements, pattern_lengths, replacement_lengths, is_final, rule_indices,
+     creates) = table
+    max_size = max_length * _CHAR_SIZE
+    # Применения записываются в плоские массивы, которые целиком передаются в историю
+    applied_rules = array('l')
+    applied_positions = array('l')
+    
+    # Самые левые вхождения правил, дальше обновляются только вокруг замен.
+    # Первое применимое правило находится поиском в флагах наличия
+    positions = [_find(buffer, pattern) for pattern in patterns]
+    present = bytearray(position != -1 for position in positions)
+    
+    # Представление буфера для замен той же длины. Пока оно существует, размер
+    # буфера менять нельзя, поэтому перед заменой другой длины оно освобождается
+    view: Optional[memoryview] = None
+    
+    try:
+        for iteration in range(max_iterations):
+            if not iteration % _CANCEL_CHECK_INTERVAL:
+                if cancel_event is not None and cancel_event.is_set():
+                    return "cancelled", applied_rules, applied_positions
+                if compile_updaters is not None and iteration >= _CODEGEN_MIN_ITERATIONS:
+                    # Выполнение оказалось долгим - генерация функций окупится
+                    updaters = compile_updaters()
+                    compile_updaters = None
+            
+            index = present.find(1)
+            if index == -1:
+                # Ни одно правило не применимо - завершение работы алгоритма
+                return "completed", applied_rules, applied_positions
+            
+            # Применение правила: срез заменяется в буфере на месте,
+            # сдвигается только хвост строки
+            position = positions[index]
+            offset = position * _CHAR_SIZE
+            removed = pattern_lengths[index]
+            inserted = replacement_lengths[index]
+            if removed == inserted:
+                # Копирование на место без проверок изменения размера
+                if view is None:
+                    view = memoryview(buffer)
+                view[offset:offset + removed * _CHAR_SIZE] = replacements[index]
+            else:
+                if view is not None:
+                    view.release()
+                    view = None
+                buffer[offset:offset + removed * _CHAR_SIZE] = replacements[index]
+            applied_rules.append(rule_indices[index])
+            applied_positions.append(position)
+            
+            if updaters is not None:
+                updaters[index](positions, present, buffer, position)
+            else:
+                _update_positions(positions, present, buffer, patterns, pattern_lengths,
+                                  creates[index], position, removed, inserted)
+            
+            if len(buffer) > max_size:
+                return "output_limit", applied_rules, applied_positions
+            if is_final[index]:
+                return "completed_final", applied_rules, applied_positions
+        
+        return "iteration_limit", applied_rules, applied_positions
+    finally:
+        if view is not None:
+            view.release()
+
+class _SinglePass(NamedTuple):
+    """
+    Набор правил, который выполняется за один проход по тексту
+    
+    Правила не терминальные, вхождения разных значений не могут пересекаться,
+    и ни одна замена не может создать новое вхождение. Тогда применение
+    правила не затрагивает остальные вхождения, и алгоритм сводится
+    к замене всех вхождений, найденных в исходном тексте.
+    """
+    patterns: List[str]
+    replacements: List[str]
+    deltas: List[int]
+    rule_indices: List[int]
+    # Таблица str.translate, если все значения - одиночные символы
+    translation: Optional[Dict[int, str]]
+
+def _can_overlap(first: str, second: str) -> bool:
+    """Могут ли вхождения двух значений пересекаться в тексте"""
+    if first != second and (first in second or second in first):
+        return True
+    return any(first.endswith(second[:size]) for size in range(1, min(len(first), len(second))))
+
+def _build_single_pass(table: _RuleTable, rules: List['Rule']) -> Optional[_SinglePass]:
+    """Построить однопроходный вариант таблицы правил или None, если он неприменим"""
+    if (not table.rule_indices or not all(table.pattern_lengths) or any(table.is_final)
+            or any(map(any, table.creates))):
+        return None
+    
+    patterns = [rules[index].pattern for index in table.rule_indices]
+    if any(_can_overlap(first, second) for first in patterns for second in patterns):
+        return None
+    
+    replacements = [rules[index].replacement for index in table.rule_indices]
+    translation = None
+    if all(length == 1 for length in table.pattern_lengths):
+        translation = str.maketrans(dict(zip(patterns, replacements)))
+    
+    return _SinglePass(
+        patterns,
+        replacements,
+        [len(replacement) - len(pattern) for pattern, replacement in zip(patterns, replacements)],
+        list(table.rule_indices),
+        translation
+    )
+
+def _run_single_pass(text: str, plan: _SinglePass, max_iterations: int,
+                     max_length: int) -> Optional[Tuple[str, array, array]]:
+    """
+    Выполнить однопроходный набор правил
+    
+    Результат и применения совпадают с _run_rules: правила применяются
+    по порядку, каждое - ко всем своим вхождениям слева направо.
+    
+    Args:
+        text: Вводимый текст
+        plan: Однопроходный набор правил
+        max_iterations: Максимум итераций
+        max_length: Максимальная длина результата в символах
+        
+    Returns:
+        Кортеж (результат, индексы примененных правил, позиции применений)
+        или None, если будет достигнут лимит - тогда выполняет _run_rules
+    """
+    patterns, replacements, deltas, rule_indices, translation = plan
+    
+    # Вхождения правил в исходном тексте
+    found: List[Tuple[int, List[int]]] = []
+    total = 0
+    for slot, pattern in enumerate(patterns):
+        position = text.find(pattern)
+        if position == -1:
+            continue
+        positions = []
+        while position != -1:
+            positions.append(position)
+            position = text.find(pattern, position + len(pattern))
+        found.append((slot, positions))
+        total += len(positions)
+    
+    # Лимиты проверяются заранее: после всех применений нужна еще одна итерация,
+    # а длина внутри группы одного правила меняется монотонно
+    if total >= max_iterations:
+        return None
+    length = len(text)
+    for slot, positions in found:
+        if length + deltas[slot] > max_length:
+            return None
+        length += deltas[slot] * len(positions)
+        if length > max_length:
+            return None
+    
+    # Позиция применения - исходная позиция плюс сдвиг от уже выполненных замен левее.
+    # Вхождения не пересекаются, поэтому замена левее вхождения целиком лежит левее
+    applied_rules = array('l')
+    applied_positions = array('l')
+    shifts = [0] * len(text)
+    shifted = False
+    for slot, positions in found:
+        delta = deltas[slot]
+        applied_rules.extend(repeat(rule_indices[slot], len(positions)))
+        if shifted:
+            prefix = list(accumulate(shifts, initial=0))
+            applied_positions.extend(position + prefix[position] + order * delta
+                                     for order, position in enumerate(positions))
+        else:
+            applied_positions.extend(position + order * delta
+                                     for order, position in enumerate(positions))
+        if delta:
+            for position in positions:
+                shifts[position] = delta
+            shifted = True
+    
+    if translation is not None:
+        output = text.translate(translation)
+    else:
+        # Сборка результата из участков между вхождениями по порядку позиций
+        pieces = []
+        end = 0
+        for position, slot in sorted((position, slot) for slot, positions in found
+                                     for position in positions):
+            pieces.append(text[end:position])
+            pieces.append(replacements[slot])
+            end = position + len(patterns[slot])
+        pieces.append(text[end:])
+        output = ''.join(pieces)
+    
+    return output, applied_rules, applied_positions
 
 class Rule:
     """Представляет одиночное правило"""
     
+    __slots__ = ('pattern', 'replacement', 'is_final', 'applied_count',
+                 '_encoded_source', '_encoded')
+    
     def __init__(self, pattern: str, replacement: str, is_final: bool = False):
-        self.pattern = pattern
-        self.replacement = replacement
+        # Точная проверка типов быстрее isinstance, подробные ошибки только при несовпадении
+        if type(pattern) is not str or type(replacement) is not str or type(is_final) is not bool:
+            errors = RuleValidator.type_errors(pattern, replacement, is_final)
+            if errors:
+                raise RuleValidationError(f"Недействительное правило: {', '.join(errors)}")
+            # Подклассы str приводятся к str для интернирования
+            pattern, replacement = str(pattern), str(replacement)
+        
+        # Короткие повторяющиеся строки правил хранятся в одном экземпляре
+        self.pattern = sys.intern(pattern)
+        self.replacement = sys.intern(replacement)
         self.is_final = is_final
         self.applied_count = 0
+        self._encoded_source: Optional[Tuple[str, str]] = None
+        self._encoded: Tuple[bytes, bytes] = (b'', b'')
+    
+    def encoded(self) -> Tuple[bytes, bytes]:
+        """
+        Значение и замена в кодировке рабочего буфера
+        
+        Результат кэшируется и пересчитывается только после изменения
+        pattern или replacement, поэтому перестроение таблицы правил
+        не кодирует заново неизменившиеся правила.
+        """
+        source = (self.pattern, self.replacement)
+        if self._encoded_source != source:
+            self._encoded = (self.pattern.encode(_ENCODING), self.replacement.encode(_ENCODING))
+            self._encoded_source = source
+        return self._encoded
     
     def __str__(self) -> str:
         final_mark = " ·" if self.is_final else ""
@@ -33,40 +514,198 @@ class Rule:
         return cls(data['pattern'], data['replacement'], data.get('is_final', False))
 
 class ExecutionHistory:
-    """Отслеживает историю выполнения правил"""
+    """
+    Отслеживает историю выполнения правил
+    
+    Вхождения хранятся в параллельных массивах (итерация, индекс правила,
+    позиция, количество применений правила), словари вхождений строятся
+    только при обращении. Строки до и после замены восстанавливаются
+    по требованию из исходного текста.
+    """
     
     def __init__(self):
-        self.entries: List[Dict[str, Any]] = []
+        self._initial = ""
+        self._rules: List[Tuple[str, str, bool]] = []
+        self._snapshots: Optional[List[Tuple[str, str]]] = None
+        self._reset_arrays()
+    
+    def _reset_arrays(self) -> None:
+        """Создать пустые массивы вхождений"""
+        self._iterations = array('l')
+        self._rule_indices = array('l')
+        self._positions = array('l')
+        self._applied_counts = array('l')
     
-    def add_entry(self, iteration: int, rule: Rule, position: int, 
-                  before: str, after: str) -> None:
+    def start(self, initial_text: str, rules: List[Rule]) -> None:
+        """Начать запись истории для нового выполнения"""
+        self._reset_arrays()
+        self._initial = initial_text
+        self._rules = [(rule.pattern, rule.replacement, rule.is_final) for rule in rules]
+        self._snapshots = None
+    
+    def add_entry(self, iteration: int, rule_index: int, position: int, applied_count: int) -> None:
         """Добавляет выполняемое вхождение"""
-        self.entries.append({
-            'iteration': iteration,
-            'rule_pattern': rule.pattern,
-            'rule_replacement': rule.replacement,
-            'is_final': rule.is_final,
-            'position': position,
-            'before': before,
-            'after': after,
-            'rule_applied_count': rule.applied_count
-        })
+        self._iterations.append(iteration)
+        self._rule_indices.append(rule_index)
+        self._positions.append(position)
+        self._applied_counts.append(applied_count)
+    
+    def record(self, rule_indices: array, positions: array) -> List[int]:
+        """
+        Записать все применения выполнения одной операцией
+        
+        Args:
+            rule_indices: Индексы примененных правил по порядку
+            positions: Позиции применений
+            
+        Returns:
+            Количество применений каждого правила
+        """
+        counters = [count(1) for _ in self._rules]
+        self._iterations = array('l', range(1, len(rule_indices) + 1))
+        self._rule_indices = rule_indices
+        self._positions = positions
+        self._applied_counts = array('l', [next(counters[index]) for index in rule_indices])
+        return [next(counter) - 1 for counter in counters]
+    
+    def store_snapshots(self) -> None:
+        """Сохранить строки до и после замены для всех вхождений"""
+        self._snapshots = [(entry['before'], entry['after']) for entry in self.snapshots()]
     
     def clear(self) -> None:
         """Очистить историю"""
-        self.entries.clear()
+        self._reset_arrays()
+        self._initial = ""
+        self._rules = []
+        self._snapshots = None
+    
+    def __len__(self) -> int:
+        return len(self._positions)
+    
+    def _entry(self, index: int) -> Dict[str, Any]:
+        """Построить словарь вхождения"""
+        pattern, replacement, is_final = self._rules[self._rule_indices[index]]
+        entry = {
+            'iteration': self._iterations[index],
+            'rule_pattern': pattern,
+            'rule_replacement': replacement,
+            'is_final': is_final,
+            'position': self._positions[index],
+            'rule_applied_count': self._applied_counts[index]
+        }
+        if self._snapshots is not None:
+            entry['before'], entry['after'] = self._snapshots[index]
+        return entry
+    
+    def __iter__(self) -> Iterator[Dict[str, Any]]:
+        return (self._entry(index) for index in range(len(self)))
+    
+    @property
+    def entries(self) -> List[Dict[str, Any]]:
+        """Список словарей вхождений, строится при каждом обращении"""
+        return list(self)
+    
+    def _apply(self, buffer: bytearray, index: int, encoded: Dict[int, bytes]) -> None:
+        """Повторно применить записанную замену к буферу"""
+        rule_index = self._rule_indices[index]
+        pattern, replacement, _ = self._rules[rule_index]
+        data = encoded.get(rule_index)
+        if data is None:
+            data = encoded[rule_index] = replacement.encode(_ENCODING)
+        
+        offset = self._positions[index] * _CHAR_SIZE
+        buffer[offset:offset + len(pattern) * _CHAR_SIZE] = data
+    
+    def _replay_buffer(self, up_to: int, encoded: Dict[int, bytes]) -> bytearray:
+        """Буфер после первых up_to замен"""
+        buffer = bytearray(self._initial.encode(_ENCODING))
+        for index in range(up_to):
+            self._apply(buffer, index, encoded)
+        return buffer
+    
+    def replay(self, up_to: Optional[int] = None) -> str:
+        """
+        Восстановить строку после первых up_to замен
+        
+        Args:
+            up_to: Количество замен, None - все замены
+            
+        Returns:
+            Строка после указанного количества замен
+        """
+        _, up_to, _ = slice(up_to).indices(len(self))
+        return self._replay_buffer(up_to, {}).decode(_ENCODING)
+    
+    def snapshots(self, start: int = 0, stop: Optional[int] = None) -> Iterator[Dict[str, Any]]:
+        """
+        Вхождения истории со строками до и после замены
+        
+        Args:
+            start: Индекс первого вхождения, допускаются отрицательные как в срезах
+            stop: Индекс после последнего вхождения, None - до конца
+            
+        Returns:
+            Генератор вхождений с ключами 'before' и 'after'
+        """
+        start, stop, _ = slice(start, stop).indices(len(self))
+        encoded: Dict[int, bytes] = {}
+        buffer = self._replay_buffer(start, encoded)
+        after = buffer.decode(_ENCODING)
+        
+        for index in range(start, stop):
+            before = after
+            self._apply(buffer, index, encoded)
+            after = buffer.decode(_ENCODING)
+            yield {**self._entry(index), 'before': before, 'after': after}
+    
+    def view(self) -> 'HistoryView':
+        """Неизменяемое представление текущей истории без копирования вхождений"""
+        return HistoryView(copy.copy(self))
     
     def get_stats(self) -> Dict[str, Any]:
         """Получить статистику выполнения"""
-        if not self.entries:
+        if not len(self):
             return {}
         
+        applied_rules = set(self._rule_indices)
         return {
-            'total_steps': len(self.entries),
-            'final_rule_applied': any(entry['is_final'] for entry in self.entries),
-            'unique_rules_applied': len(set(entry['rule_pattern'] for entry in self.entries))
+            'total_steps': len(self),
+            'final_rule_applied': any(self._rules[index][2] for index in applied_rules),
+            'unique_rules_applied': len({self._rules[index][0] for index in applied_rules})
         }
 
+class HistoryView(Sequence):
+    """
+    Неизменяемое представление истории одного выполнения
+    
+    Ссылается на массивы истории, которые следующий execute() заменяет новыми,
+    поэтому данные не копируются и представление остается верным после
+    повторного выполнения. Словари вхождений строятся при обращении,
+    независимая копия - list(view).
+    """
+    
+    def __init__(self, history: ExecutionHistory):
+        self._history = history
+    
+    def __len__(self) -> int:
+        return len(self._history)
+    
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [self._history._entry(i) for i in range(*index.indices(len(self)))]
+        if index < 0:
+            index += len(self)
+        if not 0 <= index < len(self):
+            raise IndexError("Индекс вхождения истории вне диапазона")
+        return self._history._entry(index)
+    
+    def __iter__(self) -> Iterator[Dict[str, Any]]:
+        return iter(self._history)
+    
+    def snapshots(self, start: int = 0, stop: Optional[int] = None) -> Iterator[Dict[str, Any]]:
+        """Вхождения со строками до и после замены, см. ExecutionHistory.snapshots"""
+        return self._history.snapshots(start, stop)
+
 class MarkovEngine:
     """
     Основное ядро интерпретатора правил алгоритмов Маркова
@@ -79,6 +718,30 @@ class MarkovEngine:
         self.max_iterations = max_iterations
         self.max_output_length = max_output_length
         
+        # Защищает набор правил и кэши от изменения во время снимка для execute(),
+        # который может выполняться в другом потоке
+        self._rules_lock = threading.RLock()
+        
+        # Таблица правил для ядра выполнения, перестраивается при изменении правил
+        self._rule_table: Optional[_RuleTable] = None
+        
+        # Однопроходный вариант таблицы, если набор правил его допускает
+        self._single_pass: Optional[_SinglePass] = None
+        self._single_pass_checked = False
+        
+        # Сгенерированные функции обновления вхождений для ядра выполнения
+        self._updaters: Optional[List[_Updater]] = None
+        self._updaters_checked = False
+        
+        # Интернированные закодированные строки: одинаковые значения и замены
+        # разных правил хранятся одним объектом и сравниваются по номеру.
+        # Заполняются заново при каждом построении таблицы правил
+        self._intern: Dict[bytes, int] = {}
+        self._intern_rev: List[bytes] = []
+        
+        # Предупреждения проверки набора правил, вычисляются один раз на набор
+        self._cached_warnings: Optional[List[str]] = None
+        
         # Статистика выполнения
         self.reset_stats()
     
@@ -102,15 +765,157 @@ class MarkovEngine:
         Raises:
             RuleValidationError: Если правило не прошло проверку
         """
-        errors = self.validator.validate_rule(pattern, replacement, is_final)
+        rule = self._create_rule(pattern, replacement, is_final)
+        with self._rules_lock:
+            self.rules.append(rule)
+            self._invalidate_rules()
+    
+    def insert_rule(self, index: int, pattern: str, replacement: str, is_final: bool = False) -> None:
+        """
+        Вставка нового правила с проверкой перед правилом с индексом index
+        
+        Raises:
+            RuleValidationError: Если правило не прошло проверку
+        """
+        rule = self._create_rule(pattern, replacement, is_final)
+        with self._rules_lock:
+            self.rules.insert(index, rule)
+            self._invalidate_rules()
+    
+    def update_rule(self, index: int, pattern: str, replacement: str, is_final: bool = False) -> None:
+        """
+        Замена правила с индексом index с проверкой
+        
+        Raises:
+            RuleValidationError: Если правило не прошло проверку
+        """
+        rule = self._create_rule(pattern, replacement, is_final)
+        with self._rules_lock:
+            self.rules[index] = rule
+            self._invalidate_rules()
+    
+    def remove_rule(self, index: int) -> None:
+        """Удаление правила с индексом index"""
+        with self._rules_lock:
+            del self.rules[index]
+            self._invalidate_rules()
+    
+    def _create_rule(self, pattern: str, replacement: str, is_final: bool) -> Rule:
+        """Создание правила с проверкой"""
+        # Типы проверяются при создании правила
+        rule = Rule(pattern, replacement, is_final)
+        errors = self.validator.validate_rule(pattern, replacement, is_final, _skip_type_check=True)
         if errors:
             raise RuleValidationError(f"Недействительное правило: {', '.join(errors)}")
-        
-        self.rules.append(Rule(pattern, replacement, is_final))
+        return rule
     
     def clear_rules(self) -> None:
         """Очистить все правила"""
-        self.rules.clear()
+        with self._rules_lock:
+            self.rules.clear()
+            self._invalidate_rules()
+    
+    def _invalidate_rules(self) -> None:
+        """Сбросить кэши, зависящие от набора правил"""
+        self._rule_table = None
+        self._single_pass = None
+        self._single_pass_checked = False
+        self._updaters = None
+        self._updaters_checked = False
+        self._cached_warnings = None
+    
+    def _get_rule_table(self) -> _RuleTable:
+        """
+        Получить таблицу правил, построив ее при изменении правил
+        
+        В таблицу не попадают правила, которые никогда не применятся: повтор
+        уже встречавшегося значения (раньше всегда сработает первое правило)
+        и все правила после правила с пустым значением.
+        
+        Для каждой пары правил заранее определяется, может ли замена первого
+        создать новое вхождение второго. Вхождение, которого раньше не было,
+        должно включать хотя бы один вставленный символ, а при удалении без
+        вставки - пересекать место стыка, что невозможно для одного символа.
+        """
+        if self._rule_table is None:
+            # Таблица интернирования строится только из текущих правил,
+            # строки удаленных и измененных правил в ней не остаются
+            self._intern = {}
+            self._intern_rev = []
+            table = _RuleTable([], [], [], [], [], [], [])
+            seen = set()
+            for index, rule in enumerate(self.rules):
+                pattern, replacement = rule.encoded()
+                pattern_id = self._intern_bytes(pattern)
+                if pattern_id in seen:
+                    continue
+                seen.add(pattern_id)
+                table.patterns.append(self._intern_rev[pattern_id])
+                table.replacements.append(self._intern_rev[self._intern_bytes(replacement)])
+                table.pattern_lengths.append(len(rule.pattern))
+                table.replacement_lengths.append(len(rule.replacement))
+                table.is_final.append(rule.is_final)
+                table.rule_indices.append(index)
+                if not rule.pattern:
+                    break
+            
+            pattern_chars = [set(self.rules[index].pattern) for index in table.rule_indices]
+            for index in table.rule_indices:
+                replacement = self.rules[index].replacement
+                table.creates.append(bytearray(
+                    not chars.isdisjoint(replacement) if replacement else length > 1
+                    for chars, length in zip(pattern_chars, table.pattern_lengths)
+                ))
+            self._rule_table = table
+        return self._rule_table
+    
+    def _get_single_pass(self) -> Optional[_SinglePass]:
+        """Получить однопроходный вариант таблицы правил или None, если он неприменим"""
+        if not self._single_pass_checked:
+            self._single_pass = _build_single_pass(self._get_rule_table(), self.rules)
+            self._single_pass_checked = True
+        return self._single_pass
+    
+    def _compile_updaters_for(self, table: _RuleTable) -> Optional[List[_Updater]]:
+        """
+        Сгенерировать функции обновления вхождений для таблицы из снимка execute()
+        
+        Вызывается ядром выполнения вне блокировки, поэтому результат сохраняется
+        для следующих выполнений, только если набор правил с тех пор не изменился.
+        """
+        updaters = _compile_updaters(table)
+        with self._rules_lock:
+            if self._rule_table is table:
+                self._updaters = updaters
+                self._updaters_checked = True
+        return updaters
+    
+    def _intern_bytes(self, data: bytes) -> int:
+        """Получить номер закодированной строки, добавив ее в таблицу интернирования"""
+        string_id = self._intern.get(data)
+        if string_id is None:
+            string_id = len(self._intern_rev)
+            self._intern[data] = string_id
+            self._intern_rev.append(data)
+        return string_id
+    
+    def _get_warnings(self) -> List[str]:
+        """Предупреждения проверки набора правил, вычисляются при изменении правил"""
+        if self._cached_warnings is None:
+            self._cached_warnings = self.validate_rule_set()
+        return self._cached_warnings
+    
+    def prepare(self) -> None:
+        """
+        Заранее подготовить набор правил к выполнению
+        
+        Строит таблицу правил и предупреждения проверки, чтобы следующий
+        execute() сразу перешел к выполнению. Вызывать после изменения правил.
+        """
+        with self._rules_lock:
+            self._get_rule_table()
+            self._get_single_pass()
+            self._get_warnings()
     
     def validate_rule_set(self) -> List[str]:
         """Проверить весь набор правил"""
@@ -122,94 +927,169 @@ class MarkovEngine:
         
         return warnings
     
-    def execute(self, input_text: str, verbose: bool = False) -> Dict[str, Any]:
+    def execute(self, input_text: str, verbose: bool = False,
+                cancel_event: Optional[threading.Event] = None) -> Dict[str, Any]:
         """
         Выполнить алгоритм Маркова на введеном тексте
         
         Args:
             input_text: Вводимый текст
-            verbose: Предоставлять ли подробный вывод
+            verbose: Предоставлять ли подробный вывод и полные строки в истории
+            cancel_event: Событие, установка которого из другого потока прерывает выполнение
             
         Returns:
             Словарь с результатами выполнения
+            
+        Raises:
+            ExecutionLimitError: Если достигнут лимит итераций или длины результата
+            ExecutionCancelledError: Если выполнение отменено через cancel_event
         """
+        # Снимок набора правил: изменения правил из другого потока
+        # во время выполнения его не затрагивают
+        with self._rules_lock:
+            rules = list(self.rules)
+            table = self._get_rule_table()
+            single_pass = self._get_single_pass()
+            
+            # Функции для основного цикла, если они уже сгенерированы для этого набора
+            updaters = self._updaters
+            updaters_checked = self._updaters_checked
+            
+            # Предвыполняемае проверка, повторяется только после изменения правил
+            warnings = self._get_warnings()
+        
         # Сброс для нового выполнеия
-        self.history.clear()
-        for rule in self.rules:
-            rule.applied_count = 0
+        self.history.start(input_text, rules)
         
-        work_string = input_text
-        iteration = 0
         self.stats['total_executions'] += 1
         
-        # Предвыполняемае проверка
-        warnings = self.validate_rule_set()
         if warnings and verbose:
             print("Обнарудены потенциальные проблемы:", warnings)
         
-        # Основной цикл исполнения
-        while iteration < self.max_iterations:
-            iteration += 1
-            applied_this_iteration = False
-            
-            for rule in self.rules:
-                position = work_string.find(rule.pattern)
-                
-                if position != -1:
-                    # Применение правила
-                    before = work_string
-                    work_string = (work_string[:position] + 
-                                 rule.replacement + 
-                                 work_string[position + len(rule.pattern):])
-                    
-                    # Обновление статистики
-                    rule.applied_count += 1
-                    self.stats['total_replacements'] += 1
-                    applied_this_iteration = True
-                    
-                    # Запись в историю
-                    self.history.add_entry(iteration, rule, position, before, work_string)
-                    
-                    # Проверка на длину выводимого значения
-                    if len(work_string) > self.max_output_length:
-                        raise ExecutionLimitError(
-                            f"Достигнут лимит результата: {len(work_string)} > {self.max_output_length}"
-                        )
-                    
-                    # Проверка на терминальное правило
-                    if rule.is_final:
-                        return self._build_result(work_string, "completed_final", iteration, warnings)
-                    
-                    # Возврат к первому правилу
-                    break
+        # Однопроходное выполнение, если набор правил его допускает и лимиты не будут достигнуты
+        result = None
+        if single_pass is not None and not (cancel_event is not None and cancel_event.is_set()):
+            result = _run_single_pass(input_text, single_pass, self.max_iterations,
+                                      self.max_output_length)
+        
+        if result is not None:
+            output, applied_rules, applied_positions = result
+            status = "completed"
+        else:
+            # Основной цикл исполнения
+            buffer = bytearray(input_text.encode(_ENCODING))
+            compile_updaters = (None if updaters_checked
+                                else functools.partial(self._compile_updaters_for, table))
+            status, applied_rules, applied_positions = _run_rules(
+                buffer, table, self.max_iterations, self.max_output_length, cancel_event,
+                updaters, compile_updaters
+            )
+            output = buffer.decode(_ENCODING)
+        
+        # Обновление статистики и запись в историю
+        applied_counts = self.history.record(applied_rules, applied_positions)
+        for rule, applied_count in zip(rules, applied_counts):
+            rule.applied_count = applied_count
+        self.stats['total_replacements'] += len(applied_rules)
+        
+        # Полные строки в истории только в подробном режиме
+        if verbose:
+            self.history.store_snapshots()
+        
+        if status == "cancelled":
+            raise ExecutionCancelledError(f"Выполнение отменено после {len(applied_rules)} замен")
+        
+        if status == "output_limit":
+            raise ExecutionLimitError(
+                f"Достигнут лимит результата: {len(output)} > {self.max_output_length}"
+            )
+        
+        if status == "iteration_limit":
+            self.stats['total_cycles_detected'] += 1
+            raise ExecutionLimitError(
+                f"Достигнут максимум итераций: {self.max_iterations}"
+            )
+        
+        # Последняя итерация без применения правила тоже учитывается
+        iterations = len(applied_rules) + (status == "completed")
+        return self._build_result(output, status, iterations, warnings, rules)
+    
+    def execute_precomputed(self, input_text: str, output: str, applied_counts: List[int],
+                            verbose: bool = False,
+                            cancel_event: Optional[threading.Event] = None) -> Dict[str, Any]:
+        """
+        Выполнить алгоритм, результат которого уже вычислен без ядра выполнения
+        
+        Для наборов правил со специализированным выполнением, например нормализации
+        текста регулярным выражением. Правила набора не терминальные, и их замены
+        не удлиняют строку, поэтому лимит длины может быть достигнут, только если
+        исходный текст длиннее лимита. Результат, статистика и счетчики применений
+        правил такие же, как у execute(), но история замен не строится.
+        
+        Если выполнение достигло бы лимита или уже отменено, алгоритм выполняется
+        обычным execute(), чтобы ошибка и статистика совпадали.
+        
+        Args:
+            input_text: Вводимый текст
+            output: Результат выполнения набора правил
+            applied_counts: Количество применений каждого правила набора
+            verbose: Как в execute
+            cancel_event: Как в execute
             
-            if not applied_this_iteration:
-                # Если ни одно правило не применилось - завершение работы алгоритма
-                return self._build_result(work_string, "completed", iteration, warnings)
+        Returns:
+            Словарь с результатами выполнения
+        """
+        replacements = sum(applied_counts)
+        if (replacements >= self.max_iterations
+                or (replacements and len(input_text) > self.max_output_length)
+                or (cancel_event is not None and cancel_event.is_set())):
+            return self.execute(input_text, verbose, cancel_event)
+        
+        with self._rules_lock:
+            rules = list(self.rules)
+            warnings = self._get_warnings()
+        
+        self.history.start(input_text, rules)
+        self.stats['total_executions'] += 1
+        
+        if warnings and verbose:
+            print("Обнарудены потенциальные проблемы:", warnings)
         
-        # Достигнут лимит итераций
-        self.stats['total_cycles_detected'] += 1
-        raise ExecutionLimitError(
-            f"Достигнут максимум итераций: {self.max_iterations}"
-        )
+        applied = []
+        for rule, applied_count in zip(rules, applied_counts):
+            rule.applied_count = applied_count
+            if applied_count:
+                applied.append(rule)
+        self.stats['total_replacements'] += replacements
+        
+        # Статистика истории, как ее вычисляет ExecutionHistory.get_stats
+        history_stats = {
+            'total_steps': replacements,
+            'final_rule_applied': any(rule.is_final for rule in applied),
+            'unique_rules_applied': len({rule.pattern for rule in applied})
+        } if replacements else {}
+        return self._build_result(output, "completed", replacements + 1, warnings, rules,
+                                  history_stats)
     
     def _build_result(self, output: str, status: str, iterations: int, 
-                     warnings: List[str]) -> Dict[str, Any]:
+                     warnings: List[str], rules: List[Rule],
+                     history_stats: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
         """Построение словаря результатов"""
-        history_stats = self.history.get_stats()
+        if history_stats is None:
+            history_stats = self.history.get_stats()
         
         return {
             'output': output,
             'status': status,
             'iterations': iterations,
-            'warnings': warnings,
+            'warnings': warnings[:],
             'statistics': {
                 **self.stats,
                 **history_stats,
-                'rules_count': len(self.rules),
-                'active_rules_count': sum(1 for rule in self.rules if rule.applied_count > 0)
+                'rules_count': len(rules),
+                'active_rules_count': sum(1 for rule in rules if rule.applied_count > 0)
             },
-            'history': self.history.entries[:],  # Copy of history
+            'history': self.history.view(),
             'rule_usage': [
                 {
                     'pattern': rule.pattern,
@@ -217,23 +1097,138 @@ class MarkovEngine:
                     'is_final': rule.is_final,
                     'applied_count': rule.applied_count
                 }
-                for rule in self.rules
+                for rule in rules
             ]
         }
     
+    def execute_batch(self, inputs: List[str], verbose: bool = False,
+                      max_workers: Optional[int] = None) -> List[Dict[str, Any]]:
+        """
+        Выполнить алгоритм на нескольких независимых текстах
+        
+        Тексты распределяются по процессам: набор правил передается каждому
+        процессу один раз при запуске. Для коротких текстов затраты на запуск
+        процессов и передачу данных больше выигрыша, поэтому они выполняются
+        последовательно.
+        
+        Статистика результатов, счетчики движка и счетчики применений правил
+        (по последнему тексту) совпадают с последовательным выполнением.
+        История движка после параллельного выполнения не изменяется.
+        
+        Args:
+            inputs: Вводимые тексты
+            verbose: Как в execute
+            max_workers: Число процессов (по умолчанию число ядер)
+            
+        Returns:
+            Результаты выполнения в порядке текстов
+            
+        Raises:
+            ExecutionLimitError: Если для одного из текстов достигнут лимит
+        """
+        if len(inputs) < 2 or sum(map(len, inputs)) < _PARALLEL_MIN_LENGTH * len(inputs):
+            return [self.execute(text, verbose) for text in inputs]
+        
+        workers = max_workers or os.cpu_count() or 1
+        chunksize = max(1, len(inputs) // (workers * 4))
+        # Снимок набора правил, как в execute()
+        with self._rules_lock:
+            rules = list(self.rules)
+            init_args = (self._rules_data(), self.max_iterations, self.max_output_length)
+        with ProcessPoolExecutor(max_workers, initializer=_init_worker, initargs=init_args) as executor:
+            outcomes = list(executor.map(_execute_in_worker, inputs, [verbose] * len(inputs),
+                                         chunksize=chunksize))
+        
+        # Процессы считают статистику только по своему тексту: накопительные
+        # счетчики движка восстанавливаются в порядке текстов, как при execute(),
+        # до первого текста, на котором выполнение завершилось ошибкой
+        results = []
+        for result, error, stats, applied_counts in outcomes:
+            for key, value in stats.items():
+                self.stats[key] += value
+            
+            # execute() оставляет в правилах счетчики применений последнего текста
+            for rule, applied_count in zip(rules, applied_counts):
+                rule.applied_count = applied_count
+            
+            if error is not None:
+                raise error
+            result['statistics'].update(self.stats)
+            results.append(result)
+        return results
+    
+    def _rules_data(self) -> Dict[str, List[Any]]:
+        """Набор правил в виде параллельных массивов образцов, замен и терминальности"""
+        return {
+            'patterns': [rule.pattern for rule in self.rules],
+            'replacements': [rule.replacement for rule in self.rules],
+            'is_final': [rule.is_final for rule in self.rules]
+        }
+    
+    def _set_rules_data(self, rules_data: Dict[str, List[Any]]) -> None:
+        """Заменить набор правил параллельными массивами из _rules_data"""
+        rules = list(map(Rule, rules_data['patterns'],
+                         rules_data['replacements'], rules_data['is_final']))
+        with self._rules_lock:
+            self.clear_rules()
+            self.rules.extend(rules)
+            self._invalidate_rules()
+    
     def save_rules(self, filepath: str) -> None:
-        """Сохранение правил в json"""
-        import json
-        rules_data = [rule.to_dict() for rule in self.rules]
-        with open(filepath, 'w', encoding='utf-8') as f:
-            json.dump(rules_data, f, indent=2, ensure_ascii=False)
+        """Сохранение правил в json (параллельные массивы образцов, замен и терминальности)"""
+        with open(filepath, 'wb') as f:
+            f.write(json_io.dumps(self._rules_data()))
     
     def load_rules(self, filepath: str) -> None:
-        """Загрузка правил из json"""
-        import json
-        with open(filepath, 'r', encoding='utf-8') as f:
-            rules_data = json.load(f)
-        
-        self.clear_rules()
-        for rule_data in rules_data:
-            self.rules.append(Rule.from_dict(rule_data))
\ No newline at end of file
+        """
+        Загрузка правил из json
+        
+        Поддерживаются параллельные массивы (формат save_rules), массив правил
+        и файл экспорта с ключом 'rules'.
+        """
+        with open(filepath, 'rb') as f:
+            rules_data = json_io.loads(f.read())
+        
+        if isinstance(rules_data, dict) and 'patterns' in rules_data:
+            self._set_rules_data(rules_data)
+            return
+        
+        if isinstance(rules_data, dict):
+            rules_data = rules_data.get('rules', [])
+        rules = list(map(Rule.from_dict, rules_data))
+        with self._rules_lock:
+            self.clear_rules()
+            self.rules.extend(rules)
+            self._invalidate_rules()
+
+# Движок процесса execute_batch, создается инициализатором процесса
+_worker_engine: Optional[MarkovEngine] = None
+
+def _init_worker(rules_data: Dict[str, List[Any]], max_iterations: int,
+                 max_output_length: int) -> None:
+    """Создать движок процесса с переданным набором правил"""
+    global _worker_engine
+    _worker_engine = MarkovEngine(max_iterations, max_output_length)
+    _worker_engine._set_rules_data(rules_data)
+
+def _execute_in_worker(input_text: str, verbose: bool
+                       ) -> Tuple[Optional[Dict[str, Any]], Optional[ExecutionLimitError],
+                                  Dict[str, int], List[int]]:
+    """
+    Выполнить один текст в процессе, статистика результата только по нему
+    
+    Ошибка лимита возвращается, а не выбрасывается, чтобы основной
+    процесс учел статистику всех текстов до нее в порядке текстов.
+    
+    Returns:
+        Кортеж (результат или None, ошибка или None, статистика выполнения,
+        счетчики применений правил)
+    """
+    _worker_engine.reset_stats()
+    result = error = None
+    try:
+        result = _worker_engine.execute(input_text, verbose)
+    except ExecutionLimitError as e:
+        error = e
+    return (result, error, dict(_worker_engine.stats),
+            [rule.applied_count for rule in _worker_engine.rules])
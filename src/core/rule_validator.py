@@ -2,8 +2,12 @@
 Система проверки правил
 """
 
+from collections import OrderedDict
 from .exceptions import RuleValidationError, CycleDetectionError
-from typing import List, Tuple
+from typing import List, Tuple, Dict, Set
+
+# Сколько последних наборов правил хранит кэш проверки зацикливания
+_CYCLE_CACHE_SIZE = 32
 
 class RuleValidator:
     """Проверка правил на корректность"""
@@ -11,22 +15,20 @@ class RuleValidator:
     def __init__(self, max_rule_length: int = 1000, max_pattern_length: int = 100):
         self.max_rule_length = max_rule_length
         self.max_pattern_length = max_pattern_length
+        
+        # Предупреждения для недавно проверенных наборов правил, от старых к новым
+        self._cycle_cache: 'OrderedDict[Tuple[Tuple[str, str, bool], ...], List[str]]' = OrderedDict()
     
-    def validate_rule(self, pattern: str, replacement: str, is_final: bool) -> List[str]:
+    @staticmethod
+    def type_errors(pattern, replacement, is_final) -> List[str]:
         """
-        Проверка одиночного правила
+        Проверка типов полей правила
         
-        Args:
-            pattern: значение для поиска в тексте
-            replacement: строка на которую нужно заменить
-            is_final: терминальное ли правило
-            
         Returns:
             Список ошибок, пусто если их нет
         """
         errors = []
         
-        # Проверка типов
         if not isinstance(pattern, str):
             errors.append("Заменяемое значение для замены должно быть строкой")
         if not isinstance(replacement, str):
@@ -34,8 +36,29 @@ class RuleValidator:
         if not isinstance(is_final, bool):
             errors.append("Терминальность правила определяется значениями true или false")
         
-        if errors:
-            return errors
+        return errors
+    
+    def validate_rule(self, pattern: str, replacement: str, is_final: bool,
+                      _skip_type_check: bool = False) -> List[str]:
+        """
+        Проверка одиночного правила
+        
+        Args:
+            pattern: значение для поиска в тексте
+            replacement: строка на которую нужно заменить
+            is_final: терминальное ли правило
+            _skip_type_check: типы уже проверены при создании Rule
+            
+        Returns:
+            Список ошибок, пусто если их нет
+        """
+        # Проверка типов
+        if not _skip_type_check:
+            errors = self.type_errors(pattern, replacement, is_final)
+            if errors:
+                return errors
+        
+        errors = []
         
         # Проверка длины
         
@@ -57,6 +80,22 @@ class RuleValidator:
         Returns:
             Список с предупреждениями об зацикливаниях
         """
+        # Наборы из одного правила проверяются быстрее обращения к кэшу
+        if len(rules) < 2:
+            return self._find_cycles(rules)
+        
+        key = tuple(map(tuple, rules))
+        warnings = self._cycle_cache.get(key)
+        if warnings is None:
+            warnings = self._cycle_cache[key] = self._find_cycles(rules)
+            if len(self._cycle_cache) > _CYCLE_CACHE_SIZE:
+                self._cycle_cache.popitem(last=False)
+        else:
+            self._cycle_cache.move_to_end(key)
+        return list(warnings)
+    
+    def _find_cycles(self, rules: List[Tuple[str, str, bool]]) -> List[str]:
+        """Проверка набора правил на зацикливание без кэша, см. detect_potential_cycles"""
         warnings = []
         
         # Проверка на возможный бесконечный рост строки
@@ -64,11 +103,43 @@ class RuleValidator:
             if len(replacement) > len(pattern) and pattern != "":
                 warnings.append(f"Правило {i+1} может вызвать бесконечный рост строки: '{pattern}'→'{replacement}'")
         
-        # Проверка на взаимные замены
-        for i, (pattern1, replacement1, _) in enumerate(rules):
-            for j, (pattern2, replacement2, _) in enumerate(rules):
-                if i != j:
-                    if pattern1 in replacement2 and pattern2 in replacement1:
-                        warnings.append(f"Взаимные замены между правилами {i+1} и {j+1}")
+        # Проверка на взаимные замены: правило i заменяется в j и наоборот
+        contained = self._patterns_in_replacements(rules)
+        for i in range(len(rules)):
+            for j in sorted(contained[i]):
+                if i != j and i in contained[j]:
+                    warnings.append(f"Взаимные замены между правилами {i+1} и {j+1}")
+        
+        return warnings
+    
+    @staticmethod
+    def _patterns_in_replacements(rules: List[Tuple[str, str, bool]]) -> List[Set[int]]:
+        """
+        Найти для каждого правила значения, входящие в его замену
+        
+        Вместо попарной проверки всех правил подстроки замены нужных длин
+        ищутся в индексе значений, поэтому работа пропорциональна суммарной
+        длине замен, а не квадрату количества правил.
+        
+        Args:
+            rules: Список кортежей(pattern, replacement, is_final)
+            
+        Returns:
+            Для каждого правила множество индексов правил, чье значение входит в его замену
+        """
+        index: Dict[str, List[int]] = {}
+        for i, (pattern, _, _) in enumerate(rules):
+            index.setdefault(pattern, []).append(i)
+        lengths = sorted({len(pattern) for pattern in index})
+        
+        contained = []
+        for _, replacement, _ in rules:
+            found: Set[int] = set()
+            for length in lengths:
+                for start in range(len(replacement) - length + 1):
+                    indices = index.get(replacement[start:start + length])
+                    if indices:
+                        found.update(indices)
+            contained.append(found)
         
-        return warnings
\ No newline at end of file
+        return contained
\ No newline at end of file
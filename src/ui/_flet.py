@@ -0,0 +1,29 @@
+"""
+Отложенный импорт Flet
+
+Модуль flet загружается при первом обращении к его атрибутам, а не при
+импорте модулей интерфейса, поэтому импорт пакета ui не загружает Flet
+и его зависимости, пока интерфейс не создается.
+"""
+
+import importlib.util
+import sys
+from types import ModuleType
+
+def _lazy_import(name: str) -> ModuleType:
+    """Модуль, который выполняется при первом обращении к атрибуту"""
+    module = sys.modules.get(name)
+    if module is not None:
+        return module
+    
+    spec = importlib.util.find_spec(name)
+    if spec is None:
+        raise ModuleNotFoundError(f"No module named '{name}'", name=name)
+    
+    spec.loader = importlib.util.LazyLoader(spec.loader)
+    module = importlib.util.module_from_spec(spec)
+    sys.modules[name] = module
+    spec.loader.exec_module(module)
+    return module
+
+ft = _lazy_import('flet')
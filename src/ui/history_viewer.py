@@ -2,19 +2,70 @@
 Компонент просмотра истории выполнения
 """
 
-import flet as ft
-from typing import List, Dict, Any
+from __future__ import annotations
+
+from typing import List, Dict, Any, Optional, Sequence, Tuple, TYPE_CHECKING
+
+if TYPE_CHECKING:
+    import flet as ft
+else:
+    from ._flet import ft
+
+# Сколько вхождений истории отображается сразу и подгружается при прокрутке
+HISTORY_PAGE_SIZE = 20
+
+# Наибольшее число одновременно отображаемых карточек, лишние возвращаются в пул
+MAX_HISTORY_CARDS = 50
+
+# Расстояние до края списка в пикселях, при котором подгружаются следующие вхождения
+SCROLL_LOAD_MARGIN = 200
 
 class HistoryViewer:
     """Компонент для просмотра истории выполнения"""
     
+    # Отображаемые поля статистики и их подписи, в порядке вывода
+    _STAT_FIELDS = (
+        ('iterations', 'Итерации'),
+        ('total_replacements', 'Всего замен'),
+        ('rules_count', 'Всего правил'),
+        ('active_rules_count', 'Активные правила'),
+        ('status', 'Статус'),
+    )
+    
     def __init__(self):
         self.history_data = []
-        self._create_components()
+        
+        # Статистика последней установленной истории. Пока компонент не построен,
+        # set_history только сохраняет данные, отображаются они при build()
+        self._stats: Dict[str, Any] = {}
+        
+        # Сообщение вместо пустого списка, если история не строилась
+        self._empty_message: Optional[str] = None
+        
+        # Отображаемое окно истории [_window_start, _window_end)
+        self._window_start = 0
+        self._window_end = 0
+        
+        # Вхождения, для которых сейчас отображаются карточки, и элементы этих карточек
+        self._rendered_entries: List[Dict[str, Any]] = []
+        self._rendered_cards: List[Dict[str, Any]] = []
+        
+        # Отображаемые текст статистики и вхождения, для пропуска обновления без изменений
+        self._last_refresh_key: Optional[Tuple[str, List[Dict[str, Any]], Optional[str]]] = None
+        # Источник отображаемой истории, ее длина и текст статистики: совпадение
+        # проверяется до построения вхождений, которое требует восстановления строк
+        self._last_source: Optional[Tuple[Sequence[Dict[str, Any]], int, str, Optional[str]]] = None
+        
+        # Заранее построенные карточки: при обновлении меняются только значения текстов.
+        # Пул и элементы интерфейса создаются при первом build()
+        self._card_pool: List[Dict[str, Any]] = []
+        self._root: Optional[ft.Column] = None
     
     def _create_components(self):
         """Создание пользовательского интерфейса"""
-        self.history_list = ft.ListView(expand=True)
+        self._card_pool = [self._build_blank_card() for _ in range(MAX_HISTORY_CARDS)]
+        
+        self.history_list = ft.ListView(expand=True, on_scroll=self._on_scroll)
         
         self.stats_text = ft.Text("", size=14)
         
@@ -23,113 +74,245 @@ class HistoryViewer:
             icon="clear_all",
             on_click=self._clear_history
         )
+        
+        # Корневой элемент: одно его обновление отправляет изменения
+        # статистики и списка истории вместе
+        self._root = ft.Column([
+            ft.Row([
+                ft.Text("История выполнения", size=20, weight=ft.FontWeight.BOLD),
+                self.clear_button
+            ]),
+            self.stats_text,
+            ft.Divider(),
+            self.history_list
+        ])
     
-    def set_history(self, history_data: List[Dict[str, Any]], stats: Dict[str, Any]):
-        """Установить данные истории для отображения"""
+    def set_history(self, history_data: Sequence[Dict[str, Any]], stats: Dict[str, Any],
+                    update: bool = True, empty_message: Optional[str] = None):
+        """
+        Установить данные истории для отображения
+        
+        Отображаются последние вхождения, более ранние подгружаются при прокрутке.
+        
+        Args:
+            history_data: Вхождения истории: список или представление истории
+                выполнения (строки до и после замены строятся только для окна)
+            stats: Статистика выполнения
+            update: Отправить изменения сразу, иначе их отправит вызывающий (page.update)
+            empty_message: Сообщение при пустой истории, None - стандартное
+        """
         self.history_data = history_data
-        self._refresh_display(stats)
+        self._stats = stats
+        self._empty_message = empty_message
+        if self._root is None:
+            # Компонент еще не построен - отображение при первом build()
+            return
+        self._refresh_display(stats, update)
     
-    def _refresh_display(self, stats: Dict[str, Any]):
+    def _refresh_display(self, stats: Dict[str, Any], update: bool = True):
         """Обновить отображаемую историю"""
-        # Обновить статистику
         stats_text = self._format_stats(stats)
+        end = len(self.history_data)
+        
+        # Та же история с той же статистикой уже отображается
+        source = self._last_source
+        if (source is not None and source[0] is self.history_data
+                and source[1:] == (end, stats_text, self._empty_message)):
+            return
+        
+        start = max(0, end - HISTORY_PAGE_SIZE)
+        entries = self._load_entries(start, end)
+        
+        # Те же статистика и вхождения уже отображаются
+        key = (stats_text, entries, self._empty_message)
+        self._last_source = (self.history_data, end, stats_text, self._empty_message)
+        if key == self._last_refresh_key:
+            return
+        
+        # Обновить статистику
         self.stats_text.value = stats_text
-        self.stats_text.update()
         
-        # Обновить список истории
-        self.history_list.controls.clear()
+        # Обновить список истории: убрать вытесненные сверху карточки
+        # и добавить карточки только для новых вхождений
+        controls = self.history_list.controls
         
-        if not self.history_data:
-            self.history_list.controls.append(
-                ft.Text("Нет доступной истории выполнения", style="bodyMedium")
+        if not entries:
+            self._release_cards(0, len(self._rendered_cards))
+            controls.clear()
+            controls.append(
+                ft.Text(self._empty_message or "Нет доступной истории выполнения",
+                        style="bodyMedium")
             )
         else:
-            for entry in self.history_data[-50:]:  # Показывать последние 50 вхождений правил
-                history_card = self._create_history_card(entry)
-                self.history_list.controls.append(history_card)
+            if not self._rendered_entries:
+                # Убрать сообщение об отсутствии истории
+                controls.clear()
+            evicted = self._count_evicted(self._rendered_entries, entries)
+            self._release_cards(0, evicted)
+            kept = len(self._rendered_entries)
+            self._insert_cards(kept, entries[kept:])
+        
+        self._window_start, self._window_end = start, end
+        self._last_refresh_key = key
+        if update:
+            self._root.update()
+    
+    def _load_entries(self, start: int, stop: int) -> List[Dict[str, Any]]:
+        """Вхождения истории со строками до и после замены в диапазоне [start, stop)"""
+        if hasattr(self.history_data, 'snapshots'):
+            return list(self.history_data.snapshots(start, stop))
+        return list(self.history_data[start:stop])
+    
+    def _insert_cards(self, index: int, entries: List[Dict[str, Any]]):
+        """Вставить карточки вхождений начиная с позиции index, карточки берутся из пула"""
+        cards = []
+        for entry in entries:
+            card = self._card_pool.pop() if self._card_pool else self._build_blank_card()
+            self._fill_history_card(card, entry)
+            cards.append(card)
+        
+        self._rendered_entries[index:index] = entries
+        self._rendered_cards[index:index] = cards
+        self.history_list.controls[index:index] = [card['card'] for card in cards]
+    
+    def _release_cards(self, start: int, stop: int):
+        """Убрать карточки [start, stop) из списка и вернуть их в пул"""
+        self._card_pool.extend(self._rendered_cards[start:stop])
+        del self._rendered_cards[start:stop]
+        del self._rendered_entries[start:stop]
+        del self.history_list.controls[start:stop]
+    
+    def _on_scroll(self, e):
+        """Подгрузить вхождения при прокрутке к краю списка"""
+        if e.pixels < SCROLL_LOAD_MARGIN and self._window_start > 0:
+            self._load_older()
+        elif (e.max_scroll_extent - e.pixels < SCROLL_LOAD_MARGIN
+              and self._window_end < len(self.history_data)):
+            self._load_newer()
+    
+    def _load_older(self):
+        """Добавить сверху более ранние вхождения, лишние карточки снизу вернуть в пул"""
+        start = max(0, self._window_start - HISTORY_PAGE_SIZE)
+        self._insert_cards(0, self._load_entries(start, self._window_start))
+        self._window_start = start
         
+        excess = len(self._rendered_cards) - MAX_HISTORY_CARDS
+        if excess > 0:
+            self._release_cards(MAX_HISTORY_CARDS, len(self._rendered_cards))
+            self._window_end -= excess
         self.history_list.update()
     
+    def _load_newer(self):
+        """Добавить снизу более поздние вхождения, лишние карточки сверху вернуть в пул"""
+        end = min(len(self.history_data), self._window_end + HISTORY_PAGE_SIZE)
+        self._insert_cards(len(self._rendered_cards), self._load_entries(self._window_end, end))
+        self._window_end = end
+        
+        excess = len(self._rendered_cards) - MAX_HISTORY_CARDS
+        if excess > 0:
+            self._release_cards(0, excess)
+            self._window_start += excess
+        self.history_list.update()
+    
+    @staticmethod
+    def _count_evicted(rendered: List[Dict[str, Any]], entries: List[Dict[str, Any]]) -> int:
+        """
+        Число отображаемых вхождений, которые нужно убрать сверху списка
+        
+        Оставшиеся отображаемые вхождения должны совпадать с началом новых,
+        если такого совпадения нет, убираются все.
+        """
+        for evicted in range(len(rendered)):
+            kept = len(rendered) - evicted
+            if kept <= len(entries) and rendered[evicted:] == entries[:kept]:
+                return evicted
+        return len(rendered)
+    
     def _format_stats(self, stats: Dict[str, Any]) -> str:
         """Формат отображения статистики"""
         if not stats:
             return "Нет доступной статистики"
         
         lines = ["Статистика выполнений:"]
-        
-        if 'iterations' in stats:
-            lines.append(f"• Итерации: {stats['iterations']}")
-        if 'total_replacements' in stats:
-            lines.append(f"• Всего замен: {stats['total_replacements']}")
-        if 'rules_count' in stats:
-            lines.append(f"• Всего правил: {stats['rules_count']}")
-        if 'active_rules_count' in stats:
-            lines.append(f"• Активные правила: {stats['active_rules_count']}")
-        if 'status' in stats:
-            lines.append(f"• Статус: {stats['status']}")
-        
+        lines.extend(f"• {label}: {stats[key]}" for key, label in self._STAT_FIELDS if key in stats)
         return "\n".join(lines)
     
-    def _create_history_card(self, entry: Dict[str, Any]) -> ft.Card:
-        """Создание карточки для ввода истории"""
-        final_badge = ft.Container(
-            content=ft.Text("Терминальность", size=10, color="red"),
-            bgcolor="red",
-            padding=ft.padding.symmetric(horizontal=8, vertical=2),
-            border_radius=10
-        ) if entry.get('is_final', False) else ft.Container()
+    def _build_blank_card(self) -> Dict[str, Any]:
+        """
+        Создание пустой карточки для ввода истории
         
-        return ft.Card(
+        Returns:
+            Словарь с карточкой ('card') и ее изменяемыми элементами
+        """
+        card = {
+            'iter_text': ft.Text(weight=ft.FontWeight.BOLD, size=14),
+            'final_badge': ft.Container(
+                content=ft.Text("Терминальность", size=10, color="red"),
+                bgcolor="red",
+                padding=ft.padding.symmetric(horizontal=8, vertical=2),
+                border_radius=10
+            ),
+            'rule_text': ft.Text(size=12),
+            'pos_text': ft.Text(size=12),
+            'before_text': ft.Text(size=12, selectable=True),
+            'after_text': ft.Text(size=12, selectable=True),
+        }
+        card['card'] = ft.Card(
             content=ft.Container(
                 content=ft.Column([
-                    ft.Row([
-                        ft.Text(f"Итерация {entry['iteration']}", 
-                               weight=ft.FontWeight.BOLD, size=14),
-                        final_badge
-                    ]),
+                    ft.Row([card['iter_text'], card['final_badge']]),
                     ft.Row([
                         ft.Text("Правило:", size=12, weight=ft.FontWeight.BOLD),
-                        ft.Text(f"'{entry['rule_pattern']}' → '{entry['rule_replacement']}'", 
-                               size=12),
+                        card['rule_text'],
                     ]),
                     ft.Row([
                         ft.Text("Позиция:", size=12, weight=ft.FontWeight.BOLD),
-                        ft.Text(str(entry['position']), size=12),
+                        card['pos_text'],
                     ]),
                     ft.Row([
                         ft.Column([
                             ft.Text("До:", size=12, weight=ft.FontWeight.BOLD),
-                            ft.Text(entry['before'], size=12, selectable=True),
+                            card['before_text'],
                         ], expand=1),
                         ft.Column([
                             ft.Text("После:", size=12, weight=ft.FontWeight.BOLD),
-                            ft.Text(entry['after'], size=12, selectable=True),
+                            card['after_text'],
                         ], expand=1),
                     ]),
                 ], tight=True),
                 padding=10,
             )
         )
+        return card
+    
+    def _fill_history_card(self, card: Dict[str, Any], entry: Dict[str, Any]):
+        """Заполнить карточку данными вхождения истории"""
+        card['iter_text'].value = f"Итерация {entry['iteration']}"
+        card['final_badge'].visible = entry.get('is_final', False)
+        card['rule_text'].value = f"'{entry['rule_pattern']}' → '{entry['rule_replacement']}'"
+        card['pos_text'].value = str(entry['position'])
+        card['before_text'].value = entry['before']
+        card['after_text'].value = entry['after']
     
     def _clear_history(self, e):
         """Очистить отображаемую историю"""
-        self.history_data.clear()
+        self.history_data = []
+        self._stats = {}
+        self._empty_message = None
+        self._window_start = self._window_end = 0
+        self._last_refresh_key = None
+        self._last_source = None
+        self._release_cards(0, len(self._rendered_cards))
         self.history_list.controls.clear()
         self.history_list.controls.append(
             ft.Text("История очищена", style="bodyMedium")
         )
         self.stats_text.value = "Нет доступной статистики"
-        self.history_list.update()
-        self.stats_text.update()
+        self._root.update()
     
     def build(self) -> ft.Column:
-        """Построение компонента"""
-        return ft.Column([
-            ft.Row([
-                ft.Text("История выполнения", size=20, weight=ft.FontWeight.BOLD),
-                self.clear_button
-            ]),
-            self.stats_text,
-            ft.Divider(),
-            self.history_list
-        ])
\ No newline at end of file
+        """Построение компонента при первом вызове, с уже установленной историей"""
+        if self._root is None:
+            self._create_components()
+            self._refresh_display(self._stats, update=False)
+        return self._root
\ No newline at end of file
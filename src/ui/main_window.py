@@ -2,15 +2,31 @@
 Основное окно
 """
 
-import flet as ft
-from typing import List, Optional
+from __future__ import annotations
+
+import asyncio
+import difflib
+import threading
+import time
+from typing import List, Dict, Tuple, Optional, TYPE_CHECKING
 from ..core.markov_engine import MarkovEngine, Rule
-from ..core.exceptions import RuleValidationError, ExecutionLimitError
+from ..core.exceptions import RuleValidationError, ExecutionLimitError, ExecutionCancelledError
 from ..utils.presets import RulePresets
 from ..utils.file_io import ProjectManager
 from .rule_editor import RuleEditor
 from .history_viewer import HistoryViewer
 
+if TYPE_CHECKING:
+    import flet as ft
+else:
+    from ._flet import ft
+
+# Индекс окна истории среди окон приложения
+HISTORY_TAB_INDEX = 1
+
+# Минимальный интервал между отправками строки статуса, в секундах
+STATUS_THROTTLE = 0.05
+
 class MarkovApp:
     """Класс исполняющий алгоритмы"""
     
@@ -24,10 +40,33 @@ class MarkovApp:
         )
         self.history_viewer = HistoryViewer()
         
+        # Глубина вложенных пакетов: внутри пакета изменения элементов
+        # отправляются одним page.update() при выходе из внешнего пакета
+        self._batch_depth = 0
+        
+        # Время последней отправки статуса и ожидание отложенной отправки
+        self._last_status_ts = 0.0
+        self._status_flush_pending = False
+        
+        # Наборы пресетов и построенные по ним правила
+        self._presets_cache = RulePresets.get_presets()
+        self._preset_rules_cache: Dict[str, Tuple[List[Rule], int]] = {}
+        
+        # Событие отмены текущего выполнения
+        self._cancel_event: Optional[threading.Event] = None
+        
+        # Правила, переданные в движок последним _on_rules_changed
+        self._last_rules_signature: Optional[List[Tuple[str, str, bool]]] = None
+        
+        # Содержимое окон строится один раз и затем переиспользуется
+        self._editor_tab: Optional[ft.Container] = None
+        self._history_tab: Optional[ft.Container] = None
+        
         # Сначала создаем кнопки меню
         self._create_menu_buttons()
         
         # Затем создаем остальные компоненты
+        self._create_dialogs()
         self._create_components()
     
     def _create_menu_buttons(self):
@@ -56,6 +95,55 @@ class MarkovApp:
             on_click=self._import_rules
         )
     
+    def _create_dialogs(self):
+        """Создание окон ошибок, информации и предупреждений, они переиспользуются при каждом показе"""
+        self._error_dialog = ft.AlertDialog(
+            modal=True,
+            title=ft.Text("", color="red"),
+            content=ft.Text(""),
+            actions=[
+                ft.TextButton("OK", on_click=self._close_current_dialog),
+            ],
+        )
+        self._info_dialog = ft.AlertDialog(
+            modal=True,
+            title=ft.Text(""),
+            content=ft.Text(""),
+            actions=[
+                ft.TextButton("OK", on_click=self._close_current_dialog),
+            ],
+        )
+        self._warning_dialog = ft.AlertDialog(
+            modal=True,
+            title=ft.Text(""),
+            content=ft.Text(""),
+            actions=[
+                ft.TextButton("OK", on_click=self._close_current_dialog),
+            ],
+        )
+        
+        # Окно предупреждений проверки правил, меняется только список предупреждений
+        self._warnings_text = ft.Text("")
+        self._warnings_dialog = ft.AlertDialog(
+            modal=True,
+            title=ft.Text("Обнаружены потенциальные проблемы"),
+            content=ft.Column([
+                ft.Text("Обнаружены следующие потенциальные проблемы:"),
+                ft.Container(
+                    content=self._warnings_text,
+                    margin=ft.margin.only(top=10, left=10),
+                    padding=ft.padding.all(10),
+                    bgcolor="yellow",
+                    border_radius=8
+                ),
+                ft.Text("\nВы можете продолжить выполнение, но будьте осторожны с возможными бесконечными циклами."),
+            ], tight=True),
+            actions=[
+                ft.TextButton("Продолжить", on_click=self._close_current_dialog),
+            ],
+            actions_alignment=ft.MainAxisAlignment.END,
+        )
+    
     def _create_components(self):
         """Создание основных элементов ПИ"""
         # Текстовые поля для ввода/вывода
@@ -85,6 +173,13 @@ class MarkovApp:
             expand=True
         )
         
+        self.cancel_button = ft.ElevatedButton(
+            "Отменить",
+            icon="stop",
+            on_click=self._cancel_execution,
+            visible=False
+        )
+        
         self.clear_button = ft.ElevatedButton(
             "Очистить все",
             icon="clear_all",
@@ -117,6 +212,7 @@ class MarkovApp:
     
     def _create_tabs(self):
         """Создание основных окон"""
+        # Окно истории строится при первом открытии
         self.main_tabs = ft.Tabs(
             selected_index=0,
             animation_duration=300,
@@ -129,13 +225,23 @@ class MarkovApp:
                 ft.Tab(
                     text="История",
                     icon="history",
-                    content=self._build_history_tab()
+                    content=self._history_tab or ft.Container()
                 ),
-            ]
+            ],
+            on_change=self._on_tab_changed
         )
     
+    def _on_tab_changed(self, e):
+        """Построить окно истории при первом переходе на него"""
+        if self.main_tabs.selected_index == HISTORY_TAB_INDEX and self._history_tab is None:
+            self.main_tabs.tabs[HISTORY_TAB_INDEX].content = self._build_history_tab()
+            self.page.update()
+    
     def _build_editor_tab(self) -> ft.Container:
-        """Построение окна редактора"""
+        """Построение окна редактора, повторные вызовы возвращают уже построенное окно"""
+        if self._editor_tab is not None:
+            return self._editor_tab
+        
         text_area_row = ft.Row([
             ft.Column([self.input_text], expand=1),
             ft.Column([self.output_text], expand=1),
@@ -151,6 +257,7 @@ class MarkovApp:
         
         control_row = ft.Row([
             self.execute_button,
+            self.cancel_button,
             self.clear_button,
             self.presets_dropdown,
         ])
@@ -160,7 +267,7 @@ class MarkovApp:
             self.progress_ring
         ])
         
-        return ft.Container(
+        self._editor_tab = ft.Container(
             content=ft.Column([
                 ft.Text("Файловые операции", size=16, weight=ft.FontWeight.BOLD),
                 file_ops_row,
@@ -173,27 +280,55 @@ class MarkovApp:
             ]),
             padding=20
         )
+        return self._editor_tab
     
     def _build_history_tab(self) -> ft.Container:
-        """Построение окна с историей выполнения правил"""
-        return ft.Container(
-            content=self.history_viewer.build(),
-            padding=20
-        )
+        """Построение окна с историей выполнения правил, повторные вызовы возвращают уже построенное окно"""
+        if self._history_tab is None:
+            self._history_tab = ft.Container(
+                content=self.history_viewer.build(),
+                padding=20
+            )
+        return self._history_tab
     
     def _on_rules_changed(self, rules: List[Rule]):
-        """Вызов когда правила изменились"""
+        """Вызов когда правила изменились, в движке меняются только отличающиеся правила"""
+        signature = [(rule.pattern, rule.replacement, rule.is_final) for rule in rules]
+        if signature == self._last_rules_signature:
+            return
+        
+        self._begin_batch()
         try:
-            self.engine.clear_rules()
-            for rule in rules:
-                self.engine.add_rule(rule.pattern, rule.replacement, rule.is_final)
+            old_signature = [(rule.pattern, rule.replacement, rule.is_final)
+                             for rule in self.engine.rules]
+            matcher = difflib.SequenceMatcher(None, old_signature, signature, autojunk=False)
+            
+            # С конца, чтобы индексы еще не обработанных участков не сдвигались
+            for tag, i1, i2, j1, j2 in reversed(matcher.get_opcodes()):
+                if tag == 'equal':
+                    continue
+                common = min(i2 - i1, j2 - j1)
+                for offset in range(common):
+                    self.engine.update_rule(i1 + offset, *signature[j1 + offset])
+                for index in range(i2 - 1, i1 + common - 1, -1):
+                    self.engine.remove_rule(index)
+                for offset in range(common, j2 - j1):
+                    self.engine.insert_rule(i1 + offset, *signature[j1 + offset])
             
+            self._last_rules_signature = signature
+            
+            # Таблица правил строится сейчас, а не при нажатии "Выполнить"
+            self.engine.prepare()
             self._update_status(f"Правила обновлены: {len(rules)} правил загружено")
             
         except RuleValidationError as e:
+            self._last_rules_signature = None
             self._show_error_dialog(f"Ошибка валидации правил: {str(e)}")
         except Exception as e:
+            self._last_rules_signature = None
             self._show_error_dialog(f"Ошибка обновления правил: {str(e)}")
+        finally:
+            self._end_batch()
     
     def _load_preset(self, e):
         """Загрузить выбранный пресет"""
@@ -202,19 +337,23 @@ class MarkovApp:
             return
         
         try:
-            presets = RulePresets.get_presets()
-            if preset_key in presets:
-                # Преобразование кортежей в объекты правил
-                rules = []
-                for pattern, replacement, is_final in presets[preset_key]:
-                    rules.append(Rule(pattern, replacement, is_final))
+            if preset_key in self._presets_cache:
+                # Преобразование кортежей в объекты правил и подсчет финальных,
+                # один раз на пресет. Редактор хранит копию списка, поэтому кэш не изменяется
+                cached = self._preset_rules_cache.get(preset_key)
+                if cached is None:
+                    preset = self._presets_cache[preset_key]
+                    rules = [Rule(pattern, replacement, is_final)
+                             for pattern, replacement, is_final in preset]
+                    final_rules = sum(is_final for _, _, is_final in preset)
+                    cached = self._preset_rules_cache[preset_key] = (rules, final_rules)
+                rules, final_rules = cached
                 
                 self.rule_editor.set_rules(rules)
                 self._update_status(f"Загружен пресет: {preset_key}")
                 
                 # Отображение информации о загруженном пресете
                 rule_count = len(rules)
-                final_rules = sum(1 for r in rules if r.is_final)
                 self._show_info_dialog(
                     "Пресет загружен",
                     f"Успешно загружен пресет '{preset_key.replace('_', ' ').title()}'.\n\n"
@@ -242,18 +381,38 @@ class MarkovApp:
         # Показать прогресс
         self._set_processing(True)
         
+        self._cancel_event = threading.Event()
+        batch_started = False
         try:
-            # Выполнить алгоритм
-            result = self.engine.execute(input_text)
+            # Выполнить алгоритм в отдельном потоке, не блокируя интерфейс
+            if self._rules_match_preset('text_normalization'):
+                # Нормализация текста выполняется одним регулярным выражением:
+                # результат, статистика и лимиты как у движка, но без истории замен
+                result = await asyncio.to_thread(
+                    self._execute_text_normalization, input_text, self._cancel_event
+                )
+            else:
+                result = await asyncio.to_thread(
+                    self.engine.execute, input_text, False, self._cancel_event
+                )
+            
+            # Пакет начинается после выполнения, чтобы обновления других
+            # обработчиков во время выполнения не откладывались
+            self._begin_batch()
+            batch_started = True
             
             # Обновить результат
             self.output_text.value = result['output']
-            self.output_text.update()
             
-            # Обновить историю применения правил
+            # Обновить историю применения правил, строки восстанавливаются
+            # только для отображаемых вхождений
+            history_skipped = not result['history'] and result['statistics'].get('total_steps')
             self.history_viewer.set_history(
-                result['history'], 
-                result['statistics']
+                result['history'],
+                result['statistics'],
+                update=False,
+                empty_message=("Выполнено регулярным выражением, история недоступна"
+                               if history_skipped else None)
             )
             
             # Обновить статус
@@ -278,43 +437,114 @@ class MarkovApp:
             )
             self._update_status(f"Остановлено: {str(e)}")
             
+        except ExecutionCancelledError:
+            self._update_status("Выполнение отменено")
+            
+        except asyncio.CancelledError:
+            # Задача отменена извне: остановить и поток выполнения
+            self._cancel_event.set()
+            raise
+            
         except Exception as ex:
             error_msg = str(ex)
             self._show_error_dialog(f"Ошибка выполнения: {error_msg}")
             self._update_status(f"Ошибка: {error_msg}")
         
         finally:
+            self._cancel_event = None
+            if not batch_started:
+                self._begin_batch()
             self._set_processing(False)
+            self._end_batch()
+    
+    def _execute_text_normalization(self, input_text: str,
+                                    cancel_event: threading.Event) -> Dict:
+        """Выполнить набор text_normalization регулярным выражением через движок"""
+        output, applied_counts = RulePresets.apply_text_normalization(input_text)
+        return self.engine.execute_precomputed(input_text, output, applied_counts,
+                                               False, cancel_event)
+    
+    def _rules_match_preset(self, preset_key: str) -> bool:
+        """Совпадают ли правила движка с набором правил пресета"""
+        preset = self._presets_cache.get(preset_key)
+        rules = self.engine.rules
+        return preset is not None and len(rules) == len(preset) and all(
+            (rule.pattern, rule.replacement, rule.is_final) == preset_rule
+            for rule, preset_rule in zip(rules, preset)
+        )
+    
+    def _cancel_execution(self, e):
+        """Отменить текущее выполнение алгоритма"""
+        if self._cancel_event is not None:
+            self._cancel_event.set()
     
     def _clear_all(self, e):
         """Очищает все поля"""
+        self._begin_batch()
         try:
             self.input_text.value = ""
             self.output_text.value = ""
-            self.input_text.update()
-            self.output_text.update()
             self._update_status("Все поля очищены")
         except Exception as e:
             self._show_error_dialog(f"Ошибка очистки полей: {str(e)}")
+        finally:
+            self._end_batch()
+    
+    def _begin_batch(self):
+        """Начать пакет изменений: элементы не обновляются по отдельности"""
+        self._batch_depth += 1
+    
+    def _end_batch(self):
+        """Завершить пакет изменений, внешний пакет отправляет их одним обновлением страницы"""
+        self._batch_depth -= 1
+        if not self._batch_depth:
+            self.page.update()
+    
+    def _batch_update(self, *controls: ft.Control):
+        """Отправить изменения элементов одним обновлением, внутри пакета - при _end_batch"""
+        if not self._batch_depth:
+            self.page.update(*controls)
     
     def _set_processing(self, processing: bool):
         """Задает состояние обработки"""
         try:
             self.execute_button.disabled = processing
             self.progress_ring.visible = processing
-            self.execute_button.update()
-            self.progress_ring.update()
+            self.cancel_button.visible = processing
+            self._batch_update(self.execute_button, self.progress_ring, self.cancel_button)
         except Exception as e:
             pass
     
     def _update_status(self, message: str):
-        """Обновление статуса"""
+        """
+        Обновление статуса
+        
+        Статус отправляется не чаще раза в STATUS_THROTTLE секунд: более частые
+        сообщения только меняют текст, а последний отправляется отложенной задачей.
+        """
         try:
             self.status_bar.value = message
-            self.status_bar.update()
+            if self._batch_depth:
+                # Статус будет отправлен вместе с пакетом
+                return
+            
+            now = time.monotonic()
+            if now - self._last_status_ts >= STATUS_THROTTLE:
+                self._last_status_ts = now
+                self._batch_update(self.status_bar)
+            elif not self._status_flush_pending:
+                self._status_flush_pending = True
+                self.page.run_task(self._flush_status)
         except Exception as e:
             pass
     
+    async def _flush_status(self):
+        """Отправить последний статус после паузы ограничения частоты"""
+        await asyncio.sleep(STATUS_THROTTLE)
+        self._status_flush_pending = False
+        self._last_status_ts = time.monotonic()
+        self._batch_update(self.status_bar)
+    
     # Операции с файлами
     async def _save_project(self, e):
         """Сохранить текущий проект в файл"""
@@ -346,12 +576,14 @@ class MarkovApp:
             project_data = self.project_manager.load_project(filepath)
             
             if project_data:
-                self.rule_editor.set_rules(project_data['rules'])
-                self.input_text.value = project_data.get('input_text', '')
-                self.output_text.value = project_data.get('output_text', '')
-                self.input_text.update()
-                self.output_text.update()
-                self._update_status(f"Проект загружен: {filepath}")
+                self._begin_batch()
+                try:
+                    self.rule_editor.set_rules(project_data['rules'])
+                    self.input_text.value = project_data.get('input_text', '')
+                    self.output_text.value = project_data.get('output_text', '')
+                    self._update_status(f"Проект загружен: {filepath}")
+                finally:
+                    self._end_batch()
                 self._show_info_dialog("Успех", "Проект успешно загружен!")
             else:
                 self._show_error_dialog("Ошибка", f"Не удалось загрузить проект из {filepath}")
@@ -400,45 +632,15 @@ class MarkovApp:
             return
         
         warning_content = "\n• ".join(warnings)
+        self._warnings_text.value = f"• {warning_content}"
         
-        dialog = ft.AlertDialog(
-            modal=True,
-            title=ft.Text("Обнаружены потенциальные проблемы"),
-            content=ft.Column([
-                ft.Text("Обнаружены следующие потенциальные проблемы:"),
-                ft.Container(
-                    content=ft.Text(f"• {warning_content}"),
-                    margin=ft.margin.only(top=10, left=10),
-                    padding=ft.padding.all(10),
-                    bgcolor="yellow",
-                    border_radius=8
-                ),
-                ft.Text("\nВы можете продолжить выполнение, но будьте осторожны с возможными бесконечными циклами."),
-            ], tight=True),
-            actions=[
-                ft.TextButton("Продолжить", on_click=lambda e: self._close_dialog(dialog)),
-            ],
-            actions_alignment=ft.MainAxisAlignment.END,
-        )
-        
-        self.page.dialog = dialog
-        dialog.open = True
+        self.page.dialog = self._warnings_dialog
+        self._warnings_dialog.open = True
         self.page.update()
     
     def _show_warning_dialog(self, title: str, message: str):
         """Показать окно с предупреждениями"""
-        dialog = ft.AlertDialog(
-            modal=True,
-            title=ft.Text(title),
-            content=ft.Text(message),
-            actions=[
-                ft.TextButton("OK", on_click=lambda e: self._close_dialog(dialog)),
-            ],
-        )
-        
-        self.page.dialog = dialog
-        dialog.open = True
-        self.page.update()
+        self._open_dialog(self._warning_dialog, title, message)
     
     def _show_error_dialog(self, title: str = "Ошибка", message: str = ""):
         """Показать окно с ошибками"""
@@ -451,34 +653,24 @@ class MarkovApp:
         if len(message) > 500:
             message = message[:500] + "...\n\n(Сообщение об ошибке усечено)"
         
-        dialog = ft.AlertDialog(
-            modal=True,
-            title=ft.Text(title, color="red"),
-            content=ft.Text(message),
-            actions=[
-                ft.TextButton("OK", on_click=lambda e: self._close_dialog(dialog)),
-            ],
-        )
-        
-        self.page.dialog = dialog
-        dialog.open = True
-        self.page.update()
+        self._open_dialog(self._error_dialog, title, message)
     
     def _show_info_dialog(self, title: str, message: str):
         """Показать окно с информацией"""
-        dialog = ft.AlertDialog(
-            modal=True,
-            title=ft.Text(title),
-            content=ft.Text(message),
-            actions=[
-                ft.TextButton("OK", on_click=lambda e: self._close_dialog(dialog)),
-            ],
-        )
-        
+        self._open_dialog(self._info_dialog, title, message)
+    
+    def _open_dialog(self, dialog: ft.AlertDialog, title: str, message: str):
+        """Показать одно из постоянных окон с новыми заголовком и текстом"""
+        dialog.title.value = title
+        dialog.content.value = message
         self.page.dialog = dialog
         dialog.open = True
         self.page.update()
     
+    def _close_current_dialog(self, e):
+        """Закрыть открытое окно"""
+        self._close_dialog(self.page.dialog)
+    
     def _close_dialog(self, dialog: ft.AlertDialog):
         """Закрыть окно"""
         dialog.open = False
@@ -2,11 +2,18 @@
 Компонет редактора правил для графического пользовательского интерфейса
 """
 
-import flet as ft
-from typing import Callable, Optional, List
+from __future__ import annotations
+
+from typing import Callable, Optional, List, Tuple, Dict, Any, TYPE_CHECKING
 from ..core.markov_engine import Rule
+from ..core.rule_validator import RuleValidator
 from ..core.exceptions import RuleValidationError
 
+if TYPE_CHECKING:
+    import flet as ft
+else:
+    from ._flet import ft
+
 class RuleEditor:
     """Компонет для редактирования правил"""
     
@@ -15,6 +22,11 @@ class RuleEditor:
         self.on_error = on_error
         self.rules: List[Rule] = []
         self.selected_rule_index = None
+        self.validator = RuleValidator()
+        
+        # Отображаемые правила и элементы их карточек, для обновления только изменений
+        self._rendered_rules: List[Tuple[str, str, bool]] = []
+        self._rule_cards: List[Dict[str, Any]] = []
         
         # Создать компоненты пользовательского интерфейса
         self._create_components()
@@ -102,13 +114,18 @@ class RuleEditor:
         has_pattern = bool(pattern)
         
         # Обновление состояния конопки добавления
-        self.add_button.disabled = not has_pattern
-        self.add_button.update()
+        self._set_add_disabled(not has_pattern)
         
         # Очиста предыдущих ошибок если были исправлены
         if has_pattern:
             self._hide_error()
     
+    def _set_add_disabled(self, disabled: bool):
+        """Изменить доступность кнопки добавления, обновление только при смене состояния"""
+        if self.add_button.disabled != disabled:
+            self.add_button.disabled = disabled
+            self.add_button.update()
+    
     def _show_error(self, message: str):
         """Показ сообщения об ошибке"""
         self.error_text.value = message
@@ -116,13 +133,13 @@ class RuleEditor:
         self.error_text.update()
         
         # Отключение кнопки добавления правила если возникла ошибка
-        self.add_button.disabled = True
-        self.add_button.update()
+        self._set_add_disabled(True)
     
     def _hide_error(self):
-        """Спрятать сообщение об ошибке"""
-        self.error_text.visible = False
-        self.error_text.update()
+        """Спрятать сообщение об ошибке, если оно показано"""
+        if self.error_text.visible:
+            self.error_text.visible = False
+            self.error_text.update()
     
     def _validate_rule_data(self, pattern: str, replacement: str, is_final: bool) -> bool:
         """
@@ -132,12 +149,11 @@ class RuleEditor:
             True если все хорошо, иначе False
         """
         try:
-            # Попытка создать правило чтобы вызвать проверку
-            Rule(pattern, replacement, is_final)
+            errors = self.validator.validate_rule(pattern, replacement, is_final)
+            if errors:
+                self._show_error(f"Проверка не пройдена: {', '.join(errors)}")
+                return False
             return True
-        except RuleValidationError as e:
-            self._show_error(f"Проверка не пройдена: {str(e)}")
-            return False
         except Exception as e:
             self._show_error(f"Неожиданная ошибка: {str(e)}")
             return False
@@ -305,27 +321,48 @@ class RuleEditor:
                 self.on_error(f"Ошибка обновления кнопок: {str(e)}")
     
     def _refresh_rules_list(self):
-        """Обновить отображаемый список правил"""
+        """Обновить отображаемый список правил, перестраивая только изменившиеся карточки"""
         try:
-            self.rules_list.controls.clear()
+            rendered = [(rule.pattern, rule.replacement, rule.is_final) for rule in self.rules]
+            old = self._rendered_rules
+            controls = self.rules_list.controls
             
-            if not self.rules:
+            if not rendered:
                 # Показать пустое состояние
-                empty_state = ft.Container(
-                    content=ft.Column([
-                        ft.Icon(ft.icons.RULE, size=48, color="grey"),
-                        ft.Text("Нет определенный правил", style="bodyMedium", color="grey"),
-                        ft.Text("Добавить правила используя форму выше", style="bodySmall", color="grey"),
-                    ], horizontal_alignment=ft.CrossAxisAlignment.CENTER),
-                    padding=40,
-                    alignment=ft.alignment.center
-                )
-                self.rules_list.controls.append(empty_state)
+                controls.clear()
+                self._rule_cards.clear()
+                controls.append(self._create_empty_state())
             else:
-                for i, rule in enumerate(self.rules):
-                    rule_card = self._create_rule_card(i, rule)
-                    self.rules_list.controls.append(rule_card)
+                if not old:
+                    # Убрать пустое состояние
+                    controls.clear()
+                
+                # Совпадающие начало и конец списка не перестраиваются
+                limit = min(len(old), len(rendered))
+                prefix = 0
+                while prefix < limit and old[prefix] == rendered[prefix]:
+                    prefix += 1
+                suffix = 0
+                while suffix < limit - prefix and old[-1 - suffix] == rendered[-1 - suffix]:
+                    suffix += 1
+                old_end = len(old) - suffix
+                new_end = len(rendered) - suffix
+                
+                if old_end == new_end:
+                    # Измененные правила на прежних местах обновляются в существующих карточках
+                    for index in range(prefix, new_end):
+                        self._fill_rule_card(self._rule_cards[index], index, self.rules[index])
+                else:
+                    cards = [self._create_rule_card(index, self.rules[index])
+                             for index in range(prefix, new_end)]
+                    self._rule_cards[prefix:old_end] = cards
+                    controls[prefix:old_end] = [card['card'] for card in cards]
+                    
+                    # После вставки или удаления сдвигаются номера следующих карточек
+                    for index in range(new_end, len(rendered)):
+                        self._set_card_index(self._rule_cards[index], index)
             
+            self._rendered_rules = rendered
             self.rules_list.update()
             
         except Exception as e:
@@ -334,41 +371,68 @@ class RuleEditor:
             if self.on_error:
                 self.on_error(error_msg)
     
-    def _create_rule_card(self, index: int, rule: Rule) -> ft.Card:
-        """Создание карточки для отображения правил"""
-        try:
-            final_badge = ft.Container(
+    def _create_empty_state(self) -> ft.Container:
+        """Создание заглушки для пустого списка правил"""
+        return ft.Container(
+            content=ft.Column([
+                ft.Icon(ft.icons.RULE, size=48, color="grey"),
+                ft.Text("Нет определенный правил", style="bodyMedium", color="grey"),
+                ft.Text("Добавить правила используя форму выше", style="bodySmall", color="grey"),
+            ], horizontal_alignment=ft.CrossAxisAlignment.CENTER),
+            padding=40,
+            alignment=ft.alignment.center
+        )
+    
+    def _create_rule_card(self, index: int, rule: Rule) -> Dict[str, Any]:
+        """
+        Создание карточки для отображения правил
+        
+        Returns:
+            Словарь с карточкой ('card') и ее изменяемыми элементами
+        """
+        card = {
+            'title': ft.Text(weight=ft.FontWeight.BOLD),
+            'badge': ft.Container(
                 content=ft.Text("Терминальность", size=10, color="red"),
                 bgcolor="red",
                 padding=ft.padding.symmetric(horizontal=8, vertical=2),
                 border_radius=10
-            ) if rule.is_final else ft.Container()
-            
-            return ft.Card(
-                content=ft.Container(
-                    content=ft.Column([
-                        ft.Row([
-                            ft.Text(f"Правило {index + 1}", weight=ft.FontWeight.BOLD),
-                            final_badge
-                        ]),
-                        ft.Row([
-                            ft.Text(f"Найти: '{rule.pattern}'", size=14),
-                            ft.Icon("arrow_forward", size=16),
-                            ft.Text(f"Заменить: '{rule.replacement}'", size=14),
-                        ])
-                    ]),
-                    padding=10,
-                    on_click=lambda e, idx=index: self._select_rule(idx)
-                )
-            )
-        except Exception as e:
-            # Резервная карта на случай ошибки
-            return ft.Card(
-                content=ft.Container(
-                    content=ft.Text(f"Ошибка отобрежения карты {index + 1}", color="red"),
-                    padding=10
-                )
-            )
+            ),
+            'pattern': ft.Text(size=14),
+            'replacement': ft.Text(size=14),
+        }
+        card['body'] = ft.Container(
+            content=ft.Column([
+                ft.Row([card['title'], card['badge']]),
+                ft.Row([
+                    card['pattern'],
+                    ft.Icon("arrow_forward", size=16),
+                    card['replacement'],
+                ])
+            ]),
+            padding=10,
+            on_click=self._on_card_click
+        )
+        card['card'] = ft.Card(content=card['body'])
+        
+        self._fill_rule_card(card, index, rule)
+        return card
+    
+    def _fill_rule_card(self, card: Dict[str, Any], index: int, rule: Rule):
+        """Заполнить карточку данными правила"""
+        self._set_card_index(card, index)
+        card['badge'].visible = rule.is_final
+        card['pattern'].value = f"Найти: '{rule.pattern}'"
+        card['replacement'].value = f"Заменить: '{rule.replacement}'"
+    
+    def _set_card_index(self, card: Dict[str, Any], index: int):
+        """Задать номер карточки, по нему же выбирается правило"""
+        card['title'].value = f"Правило {index + 1}"
+        card['body'].data = index
+    
+    def _on_card_click(self, e):
+        """Выбор правила по нажатию на карточку"""
+        self._select_rule(e.control.data)
     
     def _select_rule(self, index: int):
         """Выбрать правило для изменения"""
@@ -4,10 +4,118 @@
 Пакет утилит для взаимодействия с файлами
 """
 
-import json
-from typing import Dict, Any, List
+import os
+import functools
+import shutil
+import tempfile
+from typing import Dict, Any, List, Iterable, Iterator, Union
 from pathlib import Path
 from ..core.markov_engine import Rule
+from ..core import json_io
+
+try:
+    import ijson
+except ImportError:
+    ijson = None
+
+# Ключи верхнего уровня, из которых строится информация о проекте
+_PROJECT_INFO_KEYS = frozenset(('metadata', 'version', 'input_text', 'output_text'))
+
+def _project_info(project_data: Any, filepath: str) -> Dict[str, Any]:
+    """Информация о проекте из разобранного документа, пустая если это не объект"""
+    if not isinstance(project_data, dict):
+        return {}
+    metadata = project_data.get('metadata', {})
+    return {
+        'name': metadata.get('name', Path(filepath).stem),
+        'rules_count': metadata.get('rules_count', 0),
+        'version': project_data.get('version', 'unknown'),
+        'input_text_length': len(project_data.get('input_text', '')),
+        'output_text_length': len(project_data.get('output_text', ''))
+    }
+
+def _rule_default(obj: Any) -> Dict[str, Any]:
+    """Сериализация правил в JSON без промежуточного списка словарей"""
+    if isinstance(obj, Rule):
+        return obj.to_dict()
+    raise TypeError(f"Объект типа {type(obj).__name__} не сериализуется в JSON")
+
+def _write_atomic(filepath: str, data: Union[bytes, Iterable[bytes]]) -> None:
+    """
+    Записать файл целиком через временный файл
+    
+    Данные записываются во временный файл с уникальным именем рядом с целевым,
+    который затем заменяет целевой. При сбое во время записи прежний файл
+    остается неповрежденным, а временный удаляется. Одновременные сохранения
+    в один путь пишут в разные временные файлы.
+    
+    Args:
+        filepath: Путь к файлу
+        data: Содержимое файла или последовательность его частей
+    """
+    directory, name = os.path.split(filepath)
+    fd, tmp_path = tempfile.mkstemp(prefix=name + '.', suffix='.tmp', dir=directory or '.')
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            if isinstance(data, bytes):
+                f.write(data)
+            else:
+                f.writelines(data)
+            f.flush()
+            os.fsync(f.fileno())
+        # mkstemp создает файл только для владельца, права берутся от прежнего файла
+        try:
+            shutil.copymode(filepath, tmp_path)
+        except FileNotFoundError:
+            os.chmod(tmp_path, 0o644)
+        os.replace(tmp_path, filepath)
+    except BaseException:
+        try:
+            os.remove(tmp_path)
+        except FileNotFoundError:
+            pass
+        raise
+
+def _iter_rules_export(rules: List[Rule]) -> Iterator[bytes]:
+    """
+    Компактный JSON экспорта правил по частям
+    
+    Правила сериализуются по одному, поэтому в памяти не держится
+    весь документ целиком.
+    """
+    yield b'{"version":"1.0","type":"markov_rules","rules_count":%d,"rules":[' % len(rules)
+    for index, rule in enumerate(rules):
+        if index:
+            yield b','
+        yield json_io.dumps(rule.to_dict(), indent=False)
+    yield b']}'
+
+@functools.lru_cache(maxsize=4096)
+def _rule_cached(pattern: str, replacement: str, is_final: bool) -> Rule:
+    """
+    Общий объект правила для повторных загрузок тех же правил
+    
+    Один объект возвращается всем загрузкам, поэтому загруженные правила
+    не должны изменяться: редактор заменяет измененное правило новым
+    объектом, а движок создает собственные правила и ведет счетчики
+    применений в них.
+    """
+    return Rule(pattern, replacement, is_final)
+
+def _rule_from_dict(data: Dict[str, Any]) -> Rule:
+    """
+    Правило из словаря через кэш _rule_cached
+    
+    В кэш попадают только значения точных типов str, str и bool: иначе
+    1 и True дали бы один ключ, а нехешируемые значения - TypeError
+    вместо ошибки проверки. Остальные значения проверяет конструктор Rule.
+    """
+    pattern = data['pattern']
+    replacement = data['replacement']
+    is_final = data.get('is_final', False)
+    if type(pattern) is not str or type(replacement) is not str or type(is_final) is not bool:
+        return Rule(pattern, replacement, is_final)
+    return _rule_cached(pattern, replacement, is_final)
 
 class ProjectManager:
     """Управлят сохранением и загрузкой проектов"""
@@ -16,7 +124,7 @@ class ProjectManager:
         self.current_project_path = None
     
     def save_project(self, filepath: str, rules: List[Rule], 
-                    input_text: str = "", output_text: str = "") -> bool:
+                    input_text: str = "", output_text: str = "", indent: bool = False) -> bool:
         """
         Сохранить проект в json файл
         
@@ -25,6 +133,7 @@ class ProjectManager:
             rules: Список правил
             input_text: Текущий введеный текст
             output_text: Текущий результат
+            indent: Форматировать с отступами (по умолчанию компактный JSON)
             
         Returns:
             True если успешно, иначе False
@@ -36,13 +145,12 @@ class ProjectManager:
                     'name': Path(filepath).stem,
                     'rules_count': len(rules)
                 },
-                'rules': [rule.to_dict() for rule in rules],
+                'rules': rules,
                 'input_text': input_text,
                 'output_text': output_text
             }
             
-            with open(filepath, 'w', encoding='utf-8') as f:
-                json.dump(project_data, f, indent=2, ensure_ascii=False)
+            _write_atomic(filepath, json_io.dumps(project_data, indent=indent, default=_rule_default))
             
             self.current_project_path = filepath
             return True
@@ -51,6 +159,11 @@ class ProjectManager:
             print(f"Ошибка сохранения проекта: {e}")
             return False
     
+    def save_project_pretty(self, filepath: str, rules: List[Rule],
+                            input_text: str = "", output_text: str = "") -> bool:
+        """Сохранить проект в удобный для чтения json файл с отступами, см. save_project"""
+        return self.save_project(filepath, rules, input_text, output_text, indent=True)
+    
     def load_project(self, filepath: str) -> Dict[str, Any]:
         """
         Загрузить проект из json файла
@@ -59,16 +172,15 @@ class ProjectManager:
             filepath: путь к файлу
             
         Returns:
-            Словарь с данными проекта или пустой если ошибка
+            Словарь с данными проекта или пустой если ошибка. Правила
+            общие для повторных загрузок и не должны изменяться
         """
         try:
-            with open(filepath, 'r', encoding='utf-8') as f:
-                project_data = json.load(f)
+            with open(filepath, 'rb') as f:
+                project_data = json_io.loads(f.read())
             
             # Пребразовать словари правил в объекты правил
-            rules = []
-            for rule_dict in project_data.get('rules', []):
-                rules.append(Rule.from_dict(rule_dict))
+            rules = list(map(_rule_from_dict, project_data.get('rules', [])))
             
             self.current_project_path = filepath
             
@@ -82,33 +194,40 @@ class ProjectManager:
             print(f"Ошибка загрузки проекта: {e}")
             return {}
     
-    def export_rules_json(self, filepath: str, rules: List[Rule]) -> bool:
+    def export_rules_json(self, filepath: str, rules: List[Rule], indent: bool = False) -> bool:
         """
         Экспорт правил в json файл
         
         Args:
             filepath: путь у файлу
             rules: Список правил для экспорта
+            indent: Форматировать с отступами (по умолчанию компактный JSON)
             
         Returns:
             True если успешно, иначе false
         """
         try:
-            rules_data = [rule.to_dict() for rule in rules]
+            if not indent:
+                _write_atomic(filepath, _iter_rules_export(rules))
+                return True
+            
             export_data = {
                 'version': '1.0',
                 'type': 'markov_rules',
                 'rules_count': len(rules),
-                'rules': rules_data
+                'rules': rules
             }
             
-            with open(filepath, 'w', encoding='utf-8') as f:
-                json.dump(export_data, f, indent=2, ensure_ascii=False)
+            _write_atomic(filepath, json_io.dumps(export_data, indent=True, default=_rule_default))
             return True
         except Exception as e:
             print(f"Ошибка экспорта правил: {e}")
             return False
     
+    def export_rules_json_pretty(self, filepath: str, rules: List[Rule]) -> bool:
+        """Экспорт правил в удобный для чтения json файл с отступами, см. export_rules_json"""
+        return self.export_rules_json(filepath, rules, indent=True)
+    
     def import_rules_json(self, filepath: str) -> List[Rule]:
         """
         Импорт правил из json файла
@@ -118,22 +237,19 @@ class ProjectManager:
             
         Returns:
             
-        Список объектов правил или пустой список если ошибка
+        Список объектов правил или пустой список если ошибка. Правила
+        общие для повторных загрузок и не должны изменяться
         """
         try:
-            with open(filepath, 'r', encoding='utf-8') as f:
-                import_data = json.load(f)
+            with open(filepath, 'rb') as f:
+                import_data = json_io.loads(f.read())
             
-            rules = []
             if 'rules' in import_data:
                 rules_data = import_data['rules']
             else:
                 rules_data = import_data
             
-            for rule_dict in rules_data:
-                rules.append(Rule.from_dict(rule_dict))
-            
-            return rules
+            return list(map(_rule_from_dict, rules_data))
             
         except Exception as e:
             print(f"Ошибка импорта правил: {e}")
@@ -143,6 +259,9 @@ class ProjectManager:
         """
         Получить базовую информацию о проекте без его полной загрузки
         
+        Если установлен ijson, файл разбирается потоково: в памяти не строится
+        весь документ, а чтение прекращается, как только найдены все поля.
+        
         Args:
             filepath: Путь к файлу
             
@@ -150,20 +269,49 @@ class ProjectManager:
             Словарь с информацией об проекте
         """
         try:
-            with open(filepath, 'r', encoding='utf-8') as f:
-                project_data = json.load(f)
+            if ijson is not None:
+                return self._stream_project_info(filepath)
             
-            return {
-                'name': project_data.get('metadata', {}).get('name', Path(filepath).stem),
-                'rules_count': project_data.get('metadata', {}).get('rules_count', 0),
-                'version': project_data.get('version', 'unknown'),
-                'input_text_length': len(project_data.get('input_text', '')),
-                'output_text_length': len(project_data.get('output_text', ''))
-            }
+            with open(filepath, 'rb') as f:
+                return _project_info(json_io.loads(f.read()), filepath)
         except Exception as e:
             print(f"Ошибка чтения информации о проекте: {e}")
             return {}
     
+    @staticmethod
+    def _stream_project_info(filepath: str) -> Dict[str, Any]:
+        """
+        Информация о проекте потоковым разбором через ijson, см. get_project_info
+        
+        Строятся только значения нужных ключей верхнего уровня, остальные
+        (правила) пропускаются. Файл разбирается до конца, чтобы поврежденный
+        файл давал ту же ошибку, что и полный разбор.
+        """
+        project_data: Dict[str, Any] = {}
+        
+        with open(filepath, 'rb') as f:
+            events = ijson.parse(f, use_float=True)
+            _, event, _ = next(events)
+            if event != 'start_map':
+                return {}
+            
+            key = builder = None
+            depth = 0
+            for prefix, event, value in events:
+                if builder is not None:
+                    builder.event(event, value)
+                    if event in ('start_map', 'start_array'):
+                        depth += 1
+                    elif event in ('end_map', 'end_array'):
+                        depth -= 1
+                    if not depth:
+                        project_data[key] = builder.value
+                        builder = None
+                elif prefix == '' and event == 'map_key' and value in _PROJECT_INFO_KEYS:
+                    key, builder = value, ijson.ObjectBuilder()
+        
+        return _project_info(project_data, filepath)
+    
     def save_simple_rules(self, filepath: str, rules: List[Rule]) -> bool:
         """
         Сохраняет правила в простом формате(массив правил)
@@ -176,9 +324,7 @@ class ProjectManager:
             True если успешно, иначе False
         """
         try:
-            rules_data = [rule.to_dict() for rule in rules]
-            with open(filepath, 'w', encoding='utf-8') as f:
-                json.dump(rules_data, f, indent=2, ensure_ascii=False)
+            _write_atomic(filepath, json_io.dumps(rules, default=_rule_default))
             return True
         except Exception as e:
             print(f"Ошибка сохранения правил: {e}")
@@ -195,14 +341,10 @@ class ProjectManager:
             Список объектов правил
         """
         try:
-            with open(filepath, 'r', encoding='utf-8') as f:
-                rules_data = json.load(f)
-            
-            rules = []
-            for rule_dict in rules_data:
-                rules.append(Rule.from_dict(rule_dict))
+            with open(filepath, 'rb') as f:
+                rules_data = json_io.loads(f.read())
             
-            return rules
+            return [_rule_from_dict(rule_dict) for rule_dict in rules_data]
             
         except Exception as e:
             print(f"Ошибка загрузки правил: {e}")
@@ -2,74 +2,138 @@
 Стандартные алгоритмы встроенные в программу
 """
 
-from typing import Dict, List, Tuple
-from ..core.markov_engine import Rule
+import re
+from types import MappingProxyType
+from typing import List, Mapping, Tuple
+
+# Набор правил: кортежи (значение, замена, терминальность)
+PresetRules = Tuple[Tuple[str, str, bool], ...]
+
+# Наборы правил строятся один раз при импорте и не изменяются
+
+_TRANSLITERATION: PresetRules = (
+    ('а', 'a', False), ('б', 'b', False), ('в', 'v', False),
+    ('г', 'g', False), ('д', 'd', False), ('е', 'e', False),
+    ('ё', 'yo', False), ('ж', 'zh', False), ('з', 'z', False),
+    ('и', 'i', False), ('й', 'y', False), ('к', 'k', False),
+    ('л', 'l', False), ('м', 'm', False), ('н', 'n', False),
+    ('о', 'o', False), ('п', 'p', False), ('р', 'r', False),
+    ('с', 's', False), ('т', 't', False), ('у', 'u', False),
+    ('ф', 'f', False), ('х', 'kh', False), ('ц', 'ts', False),
+    ('ч', 'ch', False), ('ш', 'sh', False), ('щ', 'shch', False),
+    ('ъ', '', False), ('ы', 'y', False), ('ь', '', False),
+    ('э', 'e', False), ('ю', 'yu', False), ('я', 'ya', False)
+)
+
+_TEXT_NORMALIZATION: PresetRules = (
+    ('  ', ' ', False),  # Множество пробелов к одному
+    ('\t', ' ', False),  # Табуляции в пробелы
+    (' .', '.', False),  # Удаление пробелов перед точками
+    (' ,', ',', False),  # Удаление пробелов перед запятыми
+    (' ;', ';', False),  # Удаление пробелов перед точками с запятыми
+    (' :', ':', False),  # Удаление пробелов перед двоеточиями
+    (' ?', '?', False),  # Удаление пробелов перед знаками вопросов
+    (' !', '!', False),  # Удаление пробелов перед восклицательными знаками
+    ('\n\n\n', '\n\n', False),  # Сокращение множеств новых строк
+)
+
+# Результат нормализации не зависит от порядка применения правил: каждая
+# последовательность пробелов и табуляций сводится к одному пробелу или удаляется
+# перед знаком препинания, три и более перевода строки сводятся к двум.
+# Поэтому весь набор выполняется одним проходом регулярного выражения
+_TEXT_NORMALIZATION_RE = re.compile(
+    r'(?P<before_punctuation>[ \t]+(?=[.,;:?!]))|(?P<spaces>[ \t]+)|(?P<newlines>\n{3,})'
+)
+_TEXT_NORMALIZATION_REPLACEMENTS: Mapping[str, str] = MappingProxyType({
+    'before_punctuation': '',
+    'spaces': ' ',
+    'newlines': '\n\n'
+})
+
+# Индексы правил набора text_normalization по значению, для подсчета применений
+_TEXT_NORMALIZATION_INDEX: Mapping[str, int] = MappingProxyType({
+    pattern: index for index, (pattern, _, _) in enumerate(_TEXT_NORMALIZATION)
+})
+
+_HTML_ESCAPING: PresetRules = (
+    ('&', '&amp;', False),
+    ('<', '&lt;', False),
+    ('>', '&gt;', False),
+    ('"', '&quot;', False),
+    ("'", '&#39;', False)
+)
+
+_MARKDOWN_CLEANUP: PresetRules = (
+    ('** ', '**', False),  # Пробелы после выделеным тесктом
+    (' **', '**', False),  # Пробелы перед выделенным текстом
+    ('* ', '*', False),    # Пробелы после курсива
+    (' *', '*', False),    # Пробелы перед курсивом
+    ('__ ', '__', False),  # Пробелы после нижнего подчеркивания
+    (' __', '__', False),  # Пробелы перед нижним подчеркиванием
+)
+
+_PRESETS: Mapping[str, PresetRules] = MappingProxyType({
+    'transliteration': _TRANSLITERATION,
+    'text_normalization': _TEXT_NORMALIZATION,
+    'html_escaping': _HTML_ESCAPING,
+    'markdown_cleanup': _MARKDOWN_CLEANUP
+})
 
 class RulePresets:
     """Коллекция предопределенных наборов правил"""
     
     @staticmethod
-    def get_presets() -> Dict[str, List[Tuple[str, str, bool]]]:
-        """Получение все наборов"""
-        return {
-            'transliteration': RulePresets.transliteration(),
-            'text_normalization': RulePresets.text_normalization(),
-            'html_escaping': RulePresets.html_escaping(),
-            'markdown_cleanup': RulePresets.markdown_cleanup()
-        }
+    def get_presets() -> Mapping[str, PresetRules]:
+        """Получение все наборов (неизменяемый словарь, общий для всех вызовов)"""
+        return _PRESETS
     
     @staticmethod
-    def transliteration() -> List[Tuple[str, str, bool]]:
+    def transliteration() -> PresetRules:
         """Транслит кириллицы в латиницу"""
-        return [
-            ('а', 'a', False), ('б', 'b', False), ('в', 'v', False),
-            ('г', 'g', False), ('д', 'd', False), ('е', 'e', False),
-            ('ё', 'yo', False), ('ж', 'zh', False), ('з', 'z', False),
-            ('и', 'i', False), ('й', 'y', False), ('к', 'k', False),
-            ('л', 'l', False), ('м', 'm', False), ('н', 'n', False),
-            ('о', 'o', False), ('п', 'p', False), ('р', 'r', False),
-            ('с', 's', False), ('т', 't', False), ('у', 'u', False),
-            ('ф', 'f', False), ('х', 'kh', False), ('ц', 'ts', False),
-            ('ч', 'ch', False), ('ш', 'sh', False), ('щ', 'shch', False),
-            ('ъ', '', False), ('ы', 'y', False), ('ь', '', False),
-            ('э', 'e', False), ('ю', 'yu', False), ('я', 'ya', False)
-        ]
+        return _TRANSLITERATION
     
     @staticmethod
-    def text_normalization() -> List[Tuple[str, str, bool]]:
+    def text_normalization() -> PresetRules:
         """Нормализация и очистка текста"""
-        return [
-            ('  ', ' ', False),  # Множество пробелов к одному
-            ('\t', ' ', False),  # Табуляции в пробелы
-            (' .', '.', False),  # Удаление пробелов перед точками
-            (' ,', ',', False),  # Удаление пробелов перед запятыми
-            (' ;', ';', False),  # Удаление пробелов перед точками с запятыми
-            (' :', ':', False),  # Удаление пробелов перед двоеточиями
-            (' ?', '?', False),  # Удаление пробелов перед знаками вопросов
-            (' !', '!', False),  # Удаление пробелов перед восклицательными знаками
-            ('\n\n\n', '\n\n', False),  # Сокращение множеств новых строк
-        ]
+        return _TEXT_NORMALIZATION
+    
+    @staticmethod
+    def apply_text_normalization(text: str) -> Tuple[str, List[int]]:
+        """
+        Применить набор text_normalization к тексту за один проход
+        
+        Результат совпадает с выполнением набора движком, но без истории
+        замен и без ограничений на количество итераций и длину результата.
+        Количество применений каждого правила определяется найденным участком:
+        каждая табуляция заменяется пробелом, пробелы сводятся к одному,
+        а перед знаком препинания последний пробел удаляет правило этого знака.
+        
+        Returns:
+            Кортеж (результат, количество применений каждого правила набора)
+        """
+        index = _TEXT_NORMALIZATION_INDEX
+        applied_counts = [0] * len(_TEXT_NORMALIZATION)
+        
+        def replace(match: 're.Match[str]') -> str:
+            value = match.group()
+            if match.lastgroup == 'newlines':
+                applied_counts[index['\n\n\n']] += len(value) - 2
+            else:
+                applied_counts[index['  ']] += len(value) - 1
+                applied_counts[index['\t']] += value.count('\t')
+                if match.lastgroup == 'before_punctuation':
+                    applied_counts[index[' ' + text[match.end()]]] += 1
+            return _TEXT_NORMALIZATION_REPLACEMENTS[match.lastgroup]
+        
+        return _TEXT_NORMALIZATION_RE.sub(replace, text), applied_counts
     
     @staticmethod
-    def html_escaping() -> List[Tuple[str, str, bool]]:
+    def html_escaping() -> PresetRules:
         """Экранирование специальных символова HTML"""
-        return [
-            ('&', '&amp;', False),
-            ('<', '&lt;', False),
-            ('>', '&gt;', False),
-            ('"', '&quot;', False),
-            ("'", '&#39;', False)
-        ]
+        return _HTML_ESCAPING
     
     
     @staticmethod
-    def markdown_cleanup() -> List[Tuple[str, str, bool]]:
+    def markdown_cleanup() -> PresetRules:
         """Очистка текста формата Markdown"""
-        return [
-            ('** ', '**', False),  # Пробелы после выделеным тесктом
-            (' **', '**', False),  # Пробелы перед выделенным текстом
-            ('* ', '*', False),    # Пробелы после курсива
-            (' *', '*', False),    # Пробелы перед курсивом
-            ('__ ', '__', False),  # Пробелы после нижнего подчеркивания
-            (' __', '__', False),  # Пробелы перед нижним подчеркиванием
-        ]
\ No newline at end of file
+        return _MARKDOWN_CLEANUP
\ No newline at end of file
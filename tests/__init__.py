@@ -7,5 +7,10 @@
 import os
 import sys
 
-sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
-
+# Модули тестов импортируют приложение как пакет src от корня проекта, как main.py.
+# Корень добавляется в путь поиска один раз для всего набора (python -m unittest
+# из другого каталога), для pytest то же делает conftest.py. При discover tests
+# из корня проекта он уже в пути поиска
+_ROOT_DIR = os.path.normpath(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+if _ROOT_DIR not in sys.path:
+    sys.path.insert(0, _ROOT_DIR)
@@ -0,0 +1,12 @@
+"""
+Настройка pytest
+
+Корень проекта добавляется в путь поиска один раз до сбора тестов.
+"""
+
+import os
+import sys
+
+_ROOT_DIR = os.path.normpath(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+if _ROOT_DIR not in sys.path:
+    sys.path.insert(0, _ROOT_DIR)
@@ -0,0 +1,141 @@
+"""
+Юнит тесты для загрузки и сохранения проектов
+"""
+
+import os
+import tempfile
+import unittest
+from unittest import mock
+
+from src.core import json_io
+from src.core.exceptions import RuleValidationError
+from src.core.markov_engine import Rule
+from src.utils import file_io
+from src.utils.file_io import ProjectManager, _rule_from_dict
+
+class TestRuleFromDict(unittest.TestCase):
+    """Тесты"""
+    
+    def test_repeated_rules_shared(self):
+        """Одинаковые правила повторных загрузок - один объект"""
+        data = {'pattern': 'a', 'replacement': 'b', 'is_final': True}
+        self.assertIs(_rule_from_dict(data), _rule_from_dict(dict(data)))
+    
+    def test_invalid_types_not_cached(self):
+        """Значения неверных типов отклоняются, а не подменяются правилом из кэша"""
+        _rule_from_dict({'pattern': 'a', 'replacement': 'b', 'is_final': True})
+        with self.assertRaises(RuleValidationError):
+            _rule_from_dict({'pattern': 'a', 'replacement': 'b', 'is_final': 1})
+        with self.assertRaises(RuleValidationError):
+            _rule_from_dict({'pattern': ['a'], 'replacement': 'b'})
+
+class TestProjectFiles(unittest.TestCase):
+    """Тесты"""
+    
+    def setUp(self):
+        self.manager = ProjectManager()
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp_dir.cleanup)
+        self.rules = [Rule('a', 'b'), Rule('"\\', 'б\n', True), Rule('', 'x')]
+    
+    def _path(self, name: str) -> str:
+        return os.path.join(self.tmp_dir.name, name)
+    
+    @staticmethod
+    def _signature(rules):
+        return [(rule.pattern, rule.replacement, rule.is_final) for rule in rules]
+    
+    def test_save_and_load_project(self):
+        """Компактный и форматированный проекты загружаются одинаково"""
+        compact, pretty = self._path('compact.json'), self._path('pretty.json')
+        self.assertTrue(self.manager.save_project(compact, self.rules, 'вход', 'выход'))
+        self.assertTrue(self.manager.save_project_pretty(pretty, self.rules, 'вход', 'выход'))
+        
+        with open(compact, 'rb') as f:
+            self.assertNotIn(b'\n', f.read())
+        with open(pretty, 'rb') as f:
+            self.assertIn(b'\n  ', f.read())
+        
+        for filepath in (compact, pretty):
+            project = self.manager.load_project(filepath)
+            self.assertEqual(self._signature(project['rules']), self._signature(self.rules))
+            self.assertEqual((project['input_text'], project['output_text']), ('вход', 'выход'))
+            self.assertEqual(self.manager.current_project_path, filepath)
+    
+    def test_export_rules(self):
+        """Потоковый компактный экспорт совпадает по содержимому с форматированным"""
+        compact, pretty = self._path('compact.json'), self._path('pretty.json')
+        self.assertTrue(self.manager.export_rules_json(compact, self.rules))
+        self.assertTrue(self.manager.export_rules_json_pretty(pretty, self.rules))
+        
+        with open(compact, 'rb') as f:
+            compact_data = json_io.loads(f.read())
+        with open(pretty, 'rb') as f:
+            pretty_data = json_io.loads(f.read())
+        self.assertEqual(compact_data, pretty_data)
+        self.assertEqual(compact_data['rules_count'], len(self.rules))
+        
+        for filepath in (compact, pretty):
+            self.assertEqual(self._signature(self.manager.import_rules_json(filepath)),
+                             self._signature(self.rules))
+    
+    def test_failed_save_keeps_original(self):
+        """Ошибка сериализации не повреждает прежний файл и не оставляет временных"""
+        filepath = self._path('rules.json')
+        self.assertTrue(self.manager.export_rules_json(filepath, self.rules))
+        with open(filepath, 'rb') as f:
+            original = f.read()
+        
+        # Ошибка во время потоковой записи и до записи
+        self.assertFalse(self.manager.export_rules_json(filepath, self.rules + [object()]))
+        self.assertFalse(self.manager.save_project(filepath, self.rules + [object()]))
+        
+        with open(filepath, 'rb') as f:
+            self.assertEqual(f.read(), original)
+        self.assertEqual(os.listdir(self.tmp_dir.name), ['rules.json'])
+
+class TestProjectInfo(unittest.TestCase):
+    """Тесты"""
+    
+    def setUp(self):
+        self.manager = ProjectManager()
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp_dir.cleanup)
+    
+    def _write(self, content: str) -> str:
+        filepath = os.path.join(self.tmp_dir.name, 'project.json')
+        with open(filepath, 'w', encoding='utf-8') as f:
+            f.write(content)
+        return filepath
+    
+    def _info_both_paths(self, content: str):
+        """Информация о проекте без ijson и с ним, если он установлен"""
+        filepath = self._write(content)
+        with mock.patch.object(file_io, 'ijson', None):
+            infos = [self.manager.get_project_info(filepath)]
+        if file_io.ijson is not None:
+            infos.append(self.manager.get_project_info(filepath))
+        return infos
+    
+    def test_valid_project(self):
+        """Информация о проекте одинакова при потоковом и полном разборе"""
+        content = ('{"version": "1.0", "rules": [{"pattern": "a", "replacement": "b"}],'
+                   ' "metadata": {"name": "demo", "rules_count": 1, "extra": [1.5]},'
+                   ' "input_text": "abc", "output_text": "b"}')
+        expected = {'name': 'demo', 'rules_count': 1, 'version': '1.0',
+                    'input_text_length': 3, 'output_text_length': 1}
+        for info in self._info_both_paths(content):
+            self.assertEqual(info, expected)
+        
+        for info in self._info_both_paths('{"rules": []}'):
+            self.assertEqual(info, {'name': 'project', 'rules_count': 0, 'version': 'unknown',
+                                    'input_text_length': 0, 'output_text_length': 0})
+    
+    def test_invalid_project(self):
+        """Не объект и обрезанный файл дают пустую информацию при обоих разборах"""
+        for content in ('[1, 2]', '"text"', '', '{"version": "1.0", "input_text": "abc", "rul'):
+            for info in self._info_both_paths(content):
+                self.assertEqual(info, {}, content)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -3,13 +3,17 @@
 """
 
 import unittest
+import random
+import json
+import tempfile
+import threading
 import sys
 import os
+from unittest import mock
 
-sys.path.append(os.path.join(os.path.dirname(__file__), '..', 'src'))
-
-from core.markov_engine import MarkovEngine, Rule
-from core.exceptions import RuleValidationError, ExecutionLimitError
+from src.core import markov_engine
+from src.core.markov_engine import MarkovEngine, Rule, _compile_updaters
+from src.core.exceptions import RuleValidationError, ExecutionLimitError, ExecutionCancelledError
 
 class TestMarkovEngine(unittest.TestCase):
     """Тесты"""
@@ -62,6 +66,15 @@ class TestMarkovEngine(unittest.TestCase):
         result = self.engine.execute('aaa')
         self.assertEqual(result['output'], '111')
     
+    def test_empty_pattern_shadows_later_rules(self):
+        """Правило с пустым значением срабатывает раньше всех следующих"""
+        self.engine.add_rule('', 'x', True)
+        self.engine.add_rule('a', 'b')
+        
+        result = self.engine.execute('a')
+        self.assertEqual(result['output'], 'xa')
+        self.assertEqual([usage['applied_count'] for usage in result['rule_usage']], [1, 0])
+    
     def test_multiple_replacements(self):
         """Несколько замен за одно выполнение"""
         self.engine.add_rule('foo', 'bar')
@@ -69,6 +82,14 @@ class TestMarkovEngine(unittest.TestCase):
         self.assertEqual(result['output'], 'bar bar bar')
         self.assertEqual(result['statistics']['total_replacements'], 3)
     
+    def test_cancel_execution(self):
+        """Установленное событие отмены прерывает выполнение"""
+        self.engine.add_rule('a', 'a')
+        cancel_event = threading.Event()
+        cancel_event.set()
+        with self.assertRaises(ExecutionCancelledError):
+            self.engine.execute('a', cancel_event=cancel_event)
+    
     def test_clear_rules(self):
         """Очистка всех правил"""
         self.engine.add_rule('a', 'b')
@@ -77,6 +98,295 @@ class TestMarkovEngine(unittest.TestCase):
         
         self.engine.clear_rules()
         self.assertEqual(len(self.engine.rules), 0)
+    
+    def test_edit_rules(self):
+        """Вставка, замена и удаление правил по индексу"""
+        self.engine.add_rule('a', 'b')
+        self.engine.add_rule('c', 'd')
+        self.assertEqual(self.engine.execute('ac')['output'], 'bd')
+        
+        self.engine.insert_rule(1, 'b', 'x', True)
+        self.engine.update_rule(0, 'a', 'y')
+        self.assertEqual([rule.pattern for rule in self.engine.rules], ['a', 'b', 'c'])
+        self.assertEqual(self.engine.execute('abc')['output'], 'yxc')
+        
+        self.engine.remove_rule(1)
+        self.assertEqual(self.engine.execute('abc')['output'], 'ybd')
+        
+        with self.assertRaises(RuleValidationError):
+            self.engine.update_rule(0, 'a' * (self.engine.validator.max_pattern_length + 1), '')
+        self.assertEqual(self.engine.rules[0].replacement, 'y')
+    
+    def test_save_and_load_rules(self):
+        """Сохранение и загрузка правил, включая прежний формат массива правил"""
+        self.engine.add_rule('a', 'б')
+        self.engine.add_rule('b', '', True)
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'rules.json')
+            self.engine.save_rules(path)
+            
+            engine = MarkovEngine()
+            engine.load_rules(path)
+            self.assertEqual([rule.to_dict() for rule in engine.rules],
+                             [rule.to_dict() for rule in self.engine.rules])
+            
+            with open(path, 'w', encoding='utf-8') as f:
+                json.dump([rule.to_dict() for rule in self.engine.rules], f)
+            engine.load_rules(path)
+            self.assertEqual(engine.execute('ab')['output'], 'б')
+    
+    def test_interned_rule_strings(self):
+        """Одинаковые замены разных правил хранятся в таблице одним объектом"""
+        self.engine.add_rule('a', 'xy')
+        self.engine.add_rule('b', 'xy')
+        self.engine.add_rule('a', 'z')
+        table = self.engine._get_rule_table()
+        self.assertEqual(table.rule_indices, [0, 1])
+        self.assertIs(table.replacements[0], table.replacements[1])
+    
+    def test_intern_table_holds_current_rules_only(self):
+        """Строки измененных правил не остаются в таблице интернирования"""
+        self.engine.add_rule('a', 'b')
+        for index in range(100):
+            self.engine.update_rule(0, f'a{index}', f'b{index}')
+            self.engine.execute('a')
+        self.assertEqual(len(self.engine._intern_rev), 2)
+        self.assertEqual(set(self.engine._intern), {'a99'.encode('utf-32-le'),
+                                                    'b99'.encode('utf-32-le')})
+    
+    def test_execute_batch(self):
+        """Пакетное выполнение совпадает с выполнением по одному тексту"""
+        self.engine.add_rule('ab', 'ba')
+        self.engine.add_rule('c', '')
+        inputs = ['ab' * 600 + 'c', 'ba' * 700, 'cab' * 500, 'a' * 1200]
+        self.engine.max_iterations = 10 ** 6
+        
+        results = self.engine.execute_batch(inputs, max_workers=2)
+        expected = [text.count('b') * 'b' + text.count('a') * 'a' for text in inputs]
+        self.assertEqual([result['output'] for result in results], expected)
+        self.assertEqual(len(results[0]['history']), results[0]['statistics']['total_replacements'])
+        self.assertEqual(self.engine.stats['total_executions'], len(inputs))
+        
+        # Короткие тексты выполняются последовательно
+        self.assertEqual([result['output'] for result in self.engine.execute_batch(['abc', 'c'])],
+                         ['ba', ''])
+    
+    def test_execute_batch_statistics_match_sequential(self):
+        """Статистика параллельного пакета совпадает с последовательным выполнением"""
+        inputs = ['ab' * 600 + 'c', 'ba' * 700 + 'cc', 'cab' * 500]
+        engines = []
+        for parallel in (False, True):
+            engine = MarkovEngine(max_iterations=10 ** 6)
+            engine.add_rule('ab', 'ba')
+            engine.add_rule('c', '')
+            engine.add_rule('d', 'e')
+            engine.execute('cab')
+            min_length = markov_engine._PARALLEL_MIN_LENGTH if parallel else 10 ** 9
+            with mock.patch.object(markov_engine, '_PARALLEL_MIN_LENGTH', min_length):
+                results = engine.execute_batch(inputs, max_workers=2)
+            engines.append((engine, results))
+        
+        (sequential, sequential_results), (parallel, parallel_results) = engines
+        self.assertEqual([result['statistics'] for result in parallel_results],
+                         [result['statistics'] for result in sequential_results])
+        self.assertEqual([result['rule_usage'] for result in parallel_results],
+                         [result['rule_usage'] for result in sequential_results])
+        self.assertEqual(parallel.stats, sequential.stats)
+        self.assertEqual([rule.applied_count for rule in parallel.rules],
+                         [rule.applied_count for rule in sequential.rules])
+    
+    def test_execute_batch_error_statistics_match_sequential(self):
+        """При ошибке лимита в пакете статистика совпадает с последовательным выполнением"""
+        inputs = ['ab' * 20 + 'c', 'ab' * 3 + 'd', 'cab' * 5]
+        engines = []
+        for parallel in (False, True):
+            engine = MarkovEngine(max_iterations=5000)
+            engine.add_rule('ab', 'ba')
+            engine.add_rule('c', '')
+            engine.add_rule('d', 'd')
+            min_length = 0 if parallel else 10 ** 9
+            with mock.patch.object(markov_engine, '_PARALLEL_MIN_LENGTH', min_length):
+                with self.assertRaises(ExecutionLimitError):
+                    engine.execute_batch(inputs, max_workers=2)
+            engines.append(engine)
+        
+        sequential, parallel = engines
+        self.assertEqual(sequential.stats['total_executions'], 2)
+        self.assertEqual(sequential.stats['total_cycles_detected'], 1)
+        self.assertEqual(parallel.stats, sequential.stats)
+        self.assertEqual([rule.applied_count for rule in parallel.rules],
+                         [rule.applied_count for rule in sequential.rules])
+    
+    def test_history_snapshots(self):
+        """Строки истории восстанавливаются по требованию"""
+        self.engine.add_rule('ab', 'b')
+        self.engine.add_rule('b', 'cc')
+        result = self.engine.execute('aab')
+        self.assertNotIn('before', result['history'][0])
+        
+        snapshots = list(self.engine.history.snapshots())
+        self.assertEqual([(s['before'], s['after']) for s in snapshots],
+                         [('aab', 'ab'), ('ab', 'b'), ('b', 'cc')])
+        self.assertEqual([s['after'] for s in self.engine.history.snapshots(-1)], ['cc'])
+        self.assertEqual(self.engine.history.replay(1), 'ab')
+        
+        verbose_result = self.engine.execute('aab', verbose=True)
+        self.assertEqual(verbose_result['history'][0]['before'], 'aab')
+    
+    def test_history_view_survives_next_execution(self):
+        """История результата не меняется при следующем выполнении"""
+        self.engine.add_rule('a', 'b')
+        first = self.engine.execute('aa')
+        self.engine.execute('a')
+        
+        self.assertEqual(len(first['history']), 2)
+        self.assertEqual([entry['position'] for entry in first['history']], [0, 1])
+        self.assertEqual(first['history'][-1]['rule_applied_count'], 2)
+        self.assertEqual([s['after'] for s in first['history'].snapshots()], ['ba', 'bb'])
+    
+    def test_unaligned_bytes_not_matched(self):
+        """Совпадение байтов не на границе символа не считается вхождением"""
+        self.engine.add_rule('\x01', 'X')
+        result = self.engine.execute('\u0100\x00')
+        self.assertEqual(result['output'], '\u0100\x00')
+        self.assertEqual(result['statistics']['total_replacements'], 0)
+    
+    def test_matches_naive_execution(self):
+        """Инкрементальный поиск совпадает с наивным выполнением"""
+        rng = random.Random(42)
+        for _ in range(300):
+            rules = []
+            for _ in range(rng.randint(1, 5)):
+                pattern = ''.join(rng.choice('ab') for _ in range(rng.randint(1, 3)))
+                replacement = ''.join(rng.choice('abc') for _ in range(rng.randint(0, 3)))
+                rules.append((pattern, replacement, rng.random() < 0.1))
+            text = ''.join(rng.choice('abc') for _ in range(rng.randint(0, 12)))
+            
+            engine = MarkovEngine(max_iterations=50)
+            for rule in rules:
+                engine.add_rule(*rule)
+            
+            expected = naive_execute(rules, text, 50)
+            try:
+                result = engine.execute(text)
+            except ExecutionLimitError:
+                self.assertIsNone(expected)
+                continue
+            self.assertIsNotNone(expected)
+            self.assertEqual(result['output'], expected[0])
+            self.assertEqual(result['iterations'], expected[1])
+
+    def test_single_pass_matches_rule_loop(self):
+        """Однопроходное выполнение дает тот же результат и историю, что и основной цикл"""
+        self.engine.add_rule('б', 'b')
+        self.engine.add_rule('а', 'a')
+        self.engine.add_rule('щ', 'shch')
+        self.engine.add_rule('ъ', '')
+        result = self.engine.execute('щабъб')
+        self.assertIsNotNone(self.engine._single_pass)
+        self.assertEqual(result['output'], 'shchabb')
+        self.assertEqual([(entry['rule_pattern'], entry['position']) for entry in result['history']],
+                         [('б', 2), ('б', 4), ('а', 1), ('щ', 0), ('ъ', 6)])
+        
+        engine = MarkovEngine()
+        engine.add_rule('ab', 'X')
+        engine.add_rule('cd', 'Y')
+        result = engine.execute('cdabcd')
+        self.assertIsNotNone(engine._single_pass)
+        self.assertEqual(result['output'], 'YXY')
+        self.assertEqual([entry['position'] for entry in result['history']], [2, 0, 2])
+        
+        rng = random.Random(7)
+        for _ in range(200):
+            engine = MarkovEngine(max_iterations=rng.randint(1, 20), max_output_length=30)
+            for _ in range(rng.randint(1, 4)):
+                engine.add_rule(''.join(rng.choice('abcd') for _ in range(rng.randint(1, 2))),
+                                ''.join(rng.choice('xyz') for _ in range(rng.randint(0, 3))))
+            text = ''.join(rng.choice('abcdxyz') for _ in range(rng.randint(0, 15)))
+            
+            results = []
+            for single_pass in (True, False):
+                if not single_pass:
+                    engine._single_pass, engine._single_pass_checked = None, True
+                try:
+                    result = engine.execute(text)
+                except ExecutionLimitError:
+                    results.append(None)
+                    continue
+                results.append((result['output'], result['iterations'],
+                                [(entry['rule_pattern'], entry['position'])
+                                 for entry in result['history']]))
+            self.assertEqual(results[0], results[1])
+
+    def test_generated_updaters_match_generic(self):
+        """Сгенерированные функции обновления вхождений дают ту же историю, что и общий цикл"""
+        rng = random.Random(11)
+        for _ in range(200):
+            engine = MarkovEngine(max_iterations=40, max_output_length=40)
+            for _ in range(rng.randint(1, 5)):
+                engine.add_rule(''.join(rng.choice('ab') for _ in range(rng.randint(1, 3))),
+                                ''.join(rng.choice('abc') for _ in range(rng.randint(0, 3))),
+                                rng.random() < 0.1)
+            text = ''.join(rng.choice('abc') for _ in range(rng.randint(0, 12)))
+            
+            results = []
+            for generated in (True, False):
+                engine._single_pass, engine._single_pass_checked = None, True
+                updaters = _compile_updaters(engine._get_rule_table()) if generated else None
+                self.assertEqual(updaters is not None, generated)
+                engine._updaters, engine._updaters_checked = updaters, True
+                try:
+                    result = engine.execute(text)
+                except ExecutionLimitError as error:
+                    results.append(str(error))
+                    continue
+                results.append((result['output'],
+                                [(entry['rule_pattern'], entry['position'])
+                                 for entry in result['history']]))
+            self.assertEqual(results[0], results[1])
+
+    def test_updaters_generated_only_for_long_runs(self):
+        """Функции обновления генерируются не при подготовке, а во время долгого выполнения"""
+        engine = MarkovEngine(max_iterations=100000, max_output_length=100000)
+        engine.add_rule("ba", "ab")
+        engine.add_rule("ca", "ac")
+        engine.add_rule("cb", "bc")
+        engine.prepare()
+        self.assertFalse(engine._updaters_checked)
+        
+        # Короткое выполнение обходится общим циклом
+        result = engine.execute("cba")
+        self.assertEqual(result['output'], "abc")
+        self.assertFalse(engine._updaters_checked)
+        
+        # Долгое выполнение переключается на сгенерированные функции
+        text = "cba" * 150
+        expected = ''.join(sorted(text))
+        with mock.patch.object(markov_engine, '_compile_updaters',
+                               wraps=markov_engine._compile_updaters) as compile_mock:
+            result = engine.execute(text)
+            self.assertEqual(compile_mock.call_count, 1)
+        self.assertEqual(result['output'], expected)
+        self.assertGreater(result['iterations'], markov_engine._CODEGEN_MIN_ITERATIONS)
+        self.assertIsNotNone(engine._updaters)
+        
+        # Изменение правил сбрасывает сгенерированные функции
+        engine.add_rule("x", "y")
+        self.assertFalse(engine._updaters_checked)
+
+def naive_execute(rules, text, max_iterations):
+    """Эталонное выполнение: полный поиск каждого правила на каждой итерации"""
+    for iteration in range(1, max_iterations + 1):
+        for pattern, replacement, is_final in rules:
+            position = text.find(pattern)
+            if position != -1:
+                text = text[:position] + replacement + text[position + len(pattern):]
+                if is_final:
+                    return text, iteration
+                break
+        else:
+            return text, iteration
+    return None
 
 class TestRuleClass(unittest.TestCase):
     """Тесты для класса правил"""
@@ -89,12 +399,40 @@ class TestRuleClass(unittest.TestCase):
         self.assertTrue(rule.is_final)
         self.assertEqual(rule.applied_count, 0)
     
+    def test_rule_slots(self):
+        """Правило хранит атрибуты в слотах, без словаря экземпляра"""
+        rule = Rule('pattern', 'replacement')
+        self.assertFalse(hasattr(rule, '__dict__'))
+        with self.assertRaises(AttributeError):
+            rule.extra = 1
+    
+    def test_rule_strings_interned(self):
+        """Строки правил интернируются"""
+        rule = Rule(''.join(['*', '*']), ''.join(['_', '_']))
+        self.assertIs(rule.pattern, sys.intern('**'))
+        self.assertIs(rule.replacement, sys.intern('__'))
+    
+    def test_rule_type_check(self):
+        """Неверные типы отклоняются при создании правила"""
+        with self.assertRaises(RuleValidationError):
+            Rule(1, 'replacement')
+        with self.assertRaises(RuleValidationError):
+            Rule('pattern', 'replacement', 'yes')
+    
     def test_rule_string_representation(self):
         """Представление строкой"""
         rule = Rule('find', 'replace', True)
         self.assertIn('find', str(rule))
         self.assertIn('replace', str(rule))
     
+    def test_rule_encoding_cache(self):
+        """Кодировка правила пересчитывается после изменения"""
+        rule = Rule('a', 'b')
+        self.assertIs(rule.encoded(), rule.encoded())
+        
+        rule.replacement = 'c'
+        self.assertEqual(rule.encoded(), ('a'.encode('utf-32-le'), 'c'.encode('utf-32-le')))
+    
     def test_rule_dict_conversion(self):
         """Преобразование из/в словарь"""
         original_rule = Rule('pattern', 'replacement', True)
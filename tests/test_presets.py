@@ -0,0 +1,64 @@
+"""
+Юнит тесты для встроенных наборов правил
+"""
+
+import unittest
+import random
+
+from src.core.markov_engine import MarkovEngine
+from src.core.exceptions import ExecutionLimitError
+from src.utils.presets import RulePresets
+
+class TestTextNormalization(unittest.TestCase):
+    """Тесты"""
+    
+    def setUp(self):
+        self.engine = MarkovEngine(max_iterations=100000, max_output_length=100000)
+        for rule in RulePresets.text_normalization():
+            self.engine.add_rule(*rule)
+    
+    def test_apply_text_normalization(self):
+        """Нормализация одним проходом"""
+        text = 'Привет  ,\tмир \t!\n\n\n\nКак  дела ?'
+        self.assertEqual(RulePresets.apply_text_normalization(text),
+                         ('Привет, мир!\n\nКак дела?', [3, 2, 0, 1, 0, 0, 1, 1, 2]))
+    
+    def test_matches_engine(self):
+        """Нормализация одним проходом совпадает с движком, вместе с применениями каждого правила"""
+        rng = random.Random(3)
+        for _ in range(500):
+            text = ''.join(rng.choice(' \t\n.,;:?!ab') for _ in range(rng.randint(0, 30)))
+            result = self.engine.execute(text)
+            self.assertEqual(RulePresets.apply_text_normalization(text),
+                             (result['output'], [usage['applied_count']
+                                                 for usage in result['rule_usage']]))
+    
+    def test_execute_precomputed_matches_execute(self):
+        """Выполнение по готовому результату совпадает с execute, в том числе на лимитах"""
+        rng = random.Random(5)
+        cases = [('aaaa    aaaaa', 100, 10), ('aaaa  aaaa', 100, 10), ('a \t b', 3, 100)]
+        for _ in range(500):
+            text = ''.join(rng.choice(' \t\n.,ab') for _ in range(rng.randint(0, 20)))
+            cases.append((text, rng.randint(1, 12), rng.randint(5, 20)))
+        
+        for text, max_iterations, max_output_length in cases:
+            outcomes = []
+            for precomputed in (False, True):
+                engine = MarkovEngine(max_iterations, max_output_length)
+                for rule in RulePresets.text_normalization():
+                    engine.add_rule(*rule)
+                try:
+                    if precomputed:
+                        result = engine.execute_precomputed(
+                            text, *RulePresets.apply_text_normalization(text))
+                    else:
+                        result = engine.execute(text)
+                    del result['history']
+                except ExecutionLimitError as error:
+                    result = str(error)
+                outcomes.append((result, engine.stats,
+                                 [rule.applied_count for rule in engine.rules]))
+            self.assertEqual(outcomes[0], outcomes[1], (text, max_iterations, max_output_length))
+
+if __name__ == '__main__':
+    unittest.main()
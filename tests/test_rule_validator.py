@@ -3,12 +3,8 @@
 """
 
 import unittest
-import sys
-import os
 
-sys.path.append(os.path.join(os.path.dirname(__file__), '..', 'src'))
-
-from core.rule_validator import RuleValidator
+from src.core.rule_validator import RuleValidator
 
 class TestRuleValidator(unittest.TestCase):
     """Тесты"""
@@ -31,6 +27,38 @@ class TestRuleValidator(unittest.TestCase):
         warnings = self.validator.detect_potential_cycles(rules)
         self.assertGreater(len(warnings), 0)
     
+    def test_mutual_replacements(self):
+        """Взаимные замены находятся для каждой пары правил"""
+        rules = [
+            ('ab', 'c', False),
+            ('c', 'xaby', False),
+            ('d', 'd', False),
+            ('ab', 'e', False)
+        ]
+        
+        warnings = self.validator.detect_potential_cycles(rules)
+        mutual = [w for w in warnings if w.startswith('Взаимные')]
+        self.assertEqual(mutual, [
+            'Взаимные замены между правилами 1 и 2',
+            'Взаимные замены между правилами 2 и 1',
+        ])
+    
+    def test_cycle_detection_cache(self):
+        """Повторная проверка того же набора берется из кэша ограниченного размера"""
+        rules = [('a', 'ba', False), ('b', 'a', False)]
+        warnings = self.validator.detect_potential_cycles(rules)
+        warnings.append('изменение копии')
+        
+        self.assertEqual(self.validator.detect_potential_cycles(list(rules)),
+                         self.validator._find_cycles(rules))
+        self.assertEqual(len(self.validator._cycle_cache), 1)
+        
+        for i in range(40):
+            self.validator.detect_potential_cycles([(str(i), 'x', False), ('y', 'z', False)])
+        self.assertEqual(len(self.validator._cycle_cache), 32)
+        self.validator.detect_potential_cycles([('a', 'b', False)])
+        self.assertEqual(len(self.validator._cycle_cache), 32)
+    
     def test_pattern_too_long(self):
         """Слишком большая длина заменяемого"""
         long_pattern = 'a' * 101  # Exceeds default 100 char limit